@@ -0,0 +1,4 @@
+from flaskblog.asgi import create_asgi_app
+
+#async serving: uvicorn asgi:app --workers 4
+app = create_asgi_app()
@@ -0,0 +1,75 @@
+from flask import Flask
+import click
+import os
+
+#templates, static files and the instance folder stay at the top of the repository
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def configure(app):
+    #IMG UPLOAD PATH CONFIG
+    app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
+    app.config['ALLOWED_EXTENSIONS'] = {'jpg', 'png', 'jpeg', 'gif', 'webp'}
+    app.config['MAX_CONTENT_LENGTH'] = 3 * 1024 * 1024
+    #larger images go through the chunked upload endpoint, one request per chunk
+    app.config['UPLOAD_MAX_SIZE'] = 25 * 1024 * 1024
+    app.config['UPLOAD_SESSION_CHUNK_SIZE'] = 1024 * 1024
+    app.config['UPLOAD_SESSION_TTL_HOURS'] = 24
+    #resized copies of uploads live in a subfolder so the gallery listing never sees them
+    app.config['DERIVED_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'derived')
+    #generated sitemap shards, see sitemaps.py
+    app.config['SITEMAP_FOLDER'] = os.path.join(app.instance_path, 'sitemaps')
+
+    #db: setting and initializing
+    app.config['SECRET_KEY'] = 'DEV_SECRET_KEY_123'
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite')
+    app.config["SQLITE_TRACK_MODIFICATIONS"] = False
+    app.config['REGISTRATION_SECRET_TOKEN'] = "MY_SECRET_TOKEN"
+
+    #sqlite engine profile: WAL lets readers run while a write is in progress, busy_timeout
+    #makes a blocked writer wait instead of failing with "database is locked"
+    app.config['SQLITE_PRAGMAS'] = {
+        'journal_mode': 'WAL',
+        'busy_timeout': 5000,
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -32000,
+    }
+    #GET requests read through a second pool of read-only connections
+    app.config['SQLITE_READONLY_POOL'] = True
+    app.config['JOBS_RUN_INLINE'] = False
+    #async serving (asgi.py): bodies up to ASGI_SPOOL_SIZE are received in memory, larger
+    #ones in a temporary file; views run on ASGI_THREADS threads per worker process
+    app.config['ASGI_THREADS'] = 32
+    app.config['ASGI_SPOOL_SIZE'] = 1024 * 1024
+
+def create_app(config=None):
+    app = Flask(__name__, root_path=PROJECT_ROOT)
+    configure(app)
+    if config:
+        app.config.update(config)
+
+    from . import database, httpcache, jobs, metrics, search, tags, uploads
+    from .auth import login_manager
+
+    database.init_app(app)
+    #Flask-Migrate (and alembic below it) is only used by the `flask db` commands, and the
+    #benchmark and check commands pull in subprocess, sockets and http.client: neither
+    #is imported when the app is built by a wsgi/asgi server or a test
+    cli = click.get_current_context(silent=True) is not None
+    if cli:
+        from flask_migrate import Migrate
+        Migrate(app, database.db)
+    login_manager.init_app(app)
+    for extension in (httpcache, metrics, jobs, uploads, tags, search):
+        extension.init_app(app)
+    if cli:
+        from . import benchmarks
+        benchmarks.init_app(app)
+
+    from . import admin, auth, blog, feeds, gallery, sitemaps, users
+    for blueprint in (blog.bp, auth.bp, admin.bp, gallery.bp, users.bp, feeds.bp, sitemaps.bp):
+        app.register_blueprint(blueprint)
+    for extension in (users, feeds):
+        extension.init_app(app)
+    return app
@@ -0,0 +1,119 @@
+from flask import Blueprint, Response, abort, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+
+from .caches import CACHES, inbox_cache, invalidate_inbox
+from .database import db
+from .metrics import prometheus_metrics
+from .models import ContactMessage
+from .pagination import KeysetPagination
+
+bp = Blueprint('admin', __name__)
+
+#the inbox is paged with cursors like the post listings, one status at a time
+MESSAGES_PER_PAGE = 20
+INBOX_STATUSES = ('all', 'unread', 'read')
+
+@bp.app_template_global()
+def unread_message_count():
+    count = inbox_cache.get('unread')
+    if count is None:
+        count = ContactMessage.query.filter_by(is_read=False).count()
+        inbox_cache.set('unread', count)
+    return count
+
+#____admin contact messages____
+@bp.route("/admin/contact_messages")
+@login_required
+def admin_contact_messages():
+    if not current_user.is_admin:
+        abort(403) #forbidden
+    
+    status = request.args.get('status', 'all')
+    if status not in INBOX_STATUSES:
+        status = 'all'
+    query = ContactMessage.query
+    if status != 'all':
+        query = query.filter(ContactMessage.is_read == (status == 'read'))
+    messages = KeysetPagination(query, ContactMessage.timestamp, ContactMessage.id,
+                                after=request.args.get('after'), before=request.args.get('before'),
+                                per_page=MESSAGES_PER_PAGE)
+    return render_template('admin_contact_messages.html', messages=messages, status=status)
+
+#___mark read messages___
+@bp.route("/admin/contact_messages/<int:message_id>/read", methods=["POST"])
+@login_required
+def mark_message_read(message_id):
+    if not current_user.is_admin:
+        abort(403)
+    
+    message = ContactMessage.query.get_or_404(message_id)
+    message.is_read = True
+    db.session.commit()
+    invalidate_inbox()
+    flash('Message marked as read!', 'success')
+    return redirect(url_for("admin.admin_contact_messages", status=request.form.get('status')))
+
+#___delete messages___
+@bp.route("/admin/contact_messages/<int:message_id>/delete", methods=["POST"])
+@login_required
+def delete_contact_message(message_id):
+    if not current_user.is_admin:
+        abort(403)
+        
+    message = ContactMessage.query.get_or_404(message_id)
+    db.session.delete(message)
+    db.session.commit()
+    invalidate_inbox()
+    flash('Message deleted successfully!', 'success')
+    return redirect(url_for('admin.admin_contact_messages', status=request.form.get('status')))
+
+#___bulk actions___
+#one UPDATE or DELETE for the whole selection (or every unread message), whatever its size
+@bp.route("/admin/contact_messages/bulk", methods=["POST"])
+@login_required
+def bulk_contact_messages():
+    if not current_user.is_admin:
+        abort(403)
+
+    action = request.form.get('action')
+    message_ids = request.form.getlist('message_ids', type=int)
+    back = redirect(url_for('admin.admin_contact_messages', status=request.form.get('status')))
+    messages = ContactMessage.__table__
+    if action == 'mark_all_read':
+        statement = messages.update().where(messages.c.is_read == False).values(is_read=True)
+    elif action not in ('mark_read', 'delete'):
+        abort(400)
+    elif not message_ids:
+        flash('No messages selected.', 'info')
+        return back
+    elif action == 'mark_read':
+        statement = messages.update().where(messages.c.id.in_(message_ids), messages.c.is_read == False) \
+            .values(is_read=True)
+    else:
+        statement = messages.delete().where(messages.c.id.in_(message_ids))
+
+    changed = db.session.execute(statement).rowcount
+    db.session.commit()
+    invalidate_inbox()
+    if action == 'delete':
+        flash(f'{changed} messages deleted.', 'success')
+    else:
+        flash(f'{changed} messages marked as read.', 'success')
+    return back
+
+
+#____admin cache stats____
+@bp.route("/admin/cache_stats")
+@login_required
+def admin_cache_stats():
+    if not current_user.is_admin:
+        abort(403)
+    return jsonify({name: cache.stats() for name, cache in CACHES.items()})
+
+#____admin metrics____
+@bp.route("/admin/metrics")
+@login_required
+def admin_metrics():
+    if not current_user.is_admin:
+        abort(403)
+    return Response(prometheus_metrics(), mimetype='text/plain; version=0.0.4')
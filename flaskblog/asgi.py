@@ -0,0 +1,144 @@
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+import asyncio
+import sys
+
+from . import create_app
+
+#___asgi serving___
+#the views stay synchronous. what makes a worker wait is the network: a slow client
+#sending an upload, or reading a large response, holds a sync worker for as long as
+#it takes. here the event loop receives the whole request body (spooled to disk past
+#ASGI_SPOOL_SIZE) and sends the response; the view only runs, on a thread of its
+#own, once the body is complete. asgiref's WsgiToAsgi does the same but runs every
+#request on one shared thread, so it would serialize the views
+class AsgiAdapter:
+    def __init__(self, app):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=app.config['ASGI_THREADS'],
+                                           thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f"unsupported ASGI scope type {scope['type']!r}")
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        headers = [(name.decode('latin1'), value.decode('latin1')) for name, value in scope['headers']]
+        content_length = next((value for name, value in headers if name == 'content-length'), '')
+        declared = int(content_length) if content_length.isdigit() else None
+        limit = self.app.config['MAX_CONTENT_LENGTH']
+        with SpooledTemporaryFile(max_size=self.app.config['ASGI_SPOOL_SIZE']) as body:
+            size = None
+            #a declared size over the limit is answered by flask (413) without reading the body
+            if declared is None or limit is None or declared <= limit:
+                size = 0
+                more_body = True
+                while more_body:
+                    message = await receive()
+                    if message['type'] == 'http.disconnect':
+                        return
+                    chunk = message.get('body', b'')
+                    size += len(chunk)
+                    if limit is not None and size > limit:
+                        await send_plain(send, 413, b'Request Entity Too Large')
+                        return
+                    body.write(chunk)
+                    more_body = message.get('more_body', False)
+                body.seek(0)
+            environ = build_environ(scope, headers, body, size)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self.run_wsgi, environ, send, loop)
+
+    #runs on an executor thread; every message goes back through the loop
+    def run_wsgi(self, environ, send, loop):
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin1'), value.encode('latin1'))
+                                   for name, value in response_headers]
+
+        def send_start():
+            if 'started' not in response:
+                response['started'] = True
+                send_message({'type': 'http.response.start', 'status': response['status'],
+                              'headers': response['headers']})
+
+        iterable = self.app(environ, start_response)
+        try:
+            for chunk in iterable:
+                if chunk:
+                    send_start()
+                    send_message({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+        send_start()
+        send_message({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+async def send_plain(send, status, text):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain'), (b'content-length', str(len(text)).encode())]})
+    await send({'type': 'http.response.body', 'body': text})
+
+#size is what was received. a chunked request has no Content-Length of its own (and
+#werkzeug ignores one next to Transfer-Encoding: chunked), so without
+#wsgi.input_terminated the view would read an empty body
+def build_environ(scope, headers, body, size=None):
+    script_name = scope.get('root_path', '')
+    path = scope['path']
+    if script_name and path.startswith(script_name):
+        path = path[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name.encode('utf8').decode('latin1'),
+        'PATH_INFO': path.encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        'asgi.scope': scope,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in headers:
+        if name == 'content-length':
+            environ['CONTENT_LENGTH'] = value
+        elif name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            separator = '; ' if key == 'HTTP_COOKIE' else ','
+            environ[key] = f'{environ[key]}{separator}{value}' if key in environ else value
+    if size is not None:
+        environ['CONTENT_LENGTH'] = str(size)
+        environ['wsgi.input_terminated'] = True
+    return environ
+
+def create_asgi_app(config=None):
+    return AsgiAdapter(create_app(config))
@@ -0,0 +1,154 @@
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+from flask_login import LoginManager, UserMixin, current_user, login_required, login_user, logout_user
+from sqlalchemy import event
+from werkzeug.security import check_password_hash
+
+from .caches import user_cache
+from .database import db
+from .models import User
+
+bp = Blueprint('auth', __name__)
+
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+login_manager.login_message_category = 'info'
+
+#current_user is a small read-only record instead of the User row: most requests only
+#need the id, name and permissions. records are cached per process (see user_cache)
+#and dropped when the row changes in this process; other workers see the change once
+#the ttl expires. banned users are not loaded, which logs them out
+USER_IDENTITY_COLUMNS = ('id', 'username', 'is_admin', 'is_banned', 'role', 'profile_picture')
+
+class UserIdentity(UserMixin):
+    def __init__(self, row):
+        for column in USER_IDENTITY_COLUMNS:
+            setattr(self, column, getattr(row, column))
+
+    def __repr__(self):
+        return f'<UserIdentity: {self.id} {self.username}>'
+
+@login_manager.user_loader
+def load_user(user_id):
+    user_id = int(user_id)
+    identity = user_cache.get(user_id)
+    if identity is None:
+        row = db.session.query(*(getattr(User, column) for column in USER_IDENTITY_COLUMNS)) \
+            .filter(User.id == user_id).first()
+        if row is None:
+            return None
+        identity = UserIdentity(row)
+        user_cache.set(user_id, identity)
+    return None if identity.is_banned else identity
+
+def invalidate_user(user_id):
+    user_cache.pop(user_id)
+
+#profile edits, role changes and bans all go through a flush of the User row
+@event.listens_for(db.session, 'after_flush')
+def collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('changed_users', set())
+    changed.update(obj.id for obj in session.dirty | session.deleted if isinstance(obj, User))
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_changed_users(session):
+    for user_id in session.info.pop('changed_users', ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_changed_users(session):
+    session.info.pop('changed_users', None)
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    expected_token = current_app.config.get("REGISTRATION_SECRET_TOKEN")
+    provided_token = request.args.get('token')
+    
+    if not expected_token:
+        current_app.logger.error('REGISTRATION_SECRET_TOKEN is not set in app configuration')
+        flash('Registration is currently unavailable due to a configuration error', 'danger')
+        return redirect(url_for('blog.index'))
+    
+    if not provided_token or provided_token != expected_token:
+        flash('Access denied. Invalid or missing registration token', 'danger')
+        return redirect(url_for('auth.login'))
+        
+    if current_user.is_authenticated:
+        flash('You are already logged in', 'info')
+        return redirect(url_for('blog.index'))
+    
+    if request.method=='POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        confirm_password = request.form.get('confirm_password')
+        
+        #basics checks
+        if not username or not email or not password or not confirm_password:
+            flash('All fields are mandatory', 'error')
+            return redirect(url_for('auth.register', token = provided_token))
+        
+        if password != confirm_password:
+            flash('Passwords are not matching, try again', 'error')
+            return redirect(url_for('auth.register', token = provided_token))
+        
+        if User.query.filter_by(username=username).first():
+            flash('This username already exists', 'error')
+            return redirect(url_for('auth.register', token = provided_token))
+        
+        if User.query.filter_by(email=email).first():
+            flash('This email already exists', 'error')
+            return redirect(url_for('auth.register', token = provided_token))
+        
+        try:  
+            new_user = User(username=username, email=email)
+            new_user.set_password(password)
+            db.session.add(new_user)
+            db.session.commit()
+            flash('Your account has been created!', 'success')
+            return redirect(url_for('auth.login'))
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f'Error during user registration {e}')
+            flash('An error occurred during registration. Pleaase, try again', ' error')
+            return redirect(url_for('auth.register', token = provided_token))           
+    
+    return render_template('register.html', title="Register")
+
+#login route
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('blog.index'))
+    
+    if request.method == 'POST':
+        email = request.form.get('email')
+        password = request.form.get('password')
+        remember = True if request.form.get('remember') else False 
+        
+        user = User.query.filter_by(email=email).first()
+        #hashing is slow: release the write lock before checking the password
+        password_hash = user.password_hash if user else None
+        db.session.rollback()
+    
+        if user and check_password_hash(password_hash, password):
+            if user.is_banned:
+                flash('Your account has been suspended. Please, contact the administrator.', 'Error')
+            else:
+                login_user(user, remember=remember)
+                flash('Successfully logged in!', 'success')
+                next_page = request.args.get('next')
+                return redirect(next_page) if next_page else redirect(url_for('blog.index'))
+        else:
+            flash('Access denied. Check email and password', 'error')
+
+    return render_template('login.html', title='login')
+
+      
+@bp.route('/logout')
+@login_required
+def logout():
+    invalidate_user(current_user.id)
+    logout_user()
+    flash('You have been disconnected', 'info')
+    return redirect(url_for('blog.index'))
@@ -0,0 +1,718 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from flask import Flask, current_app, request, url_for
+from flask.cli import with_appcontext
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from werkzeug.security import generate_password_hash
+import asyncio
+import click
+import contextvars
+import http.client
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .asgi import AsgiAdapter
+from .caches import CACHES
+from .content import make_excerpt, make_summary
+from .database import db, readonly_sqlite_uri, use_sqlite_profile
+from .feeds import rebuild_feed_entries
+from .gallery import IMAGES_PER_PAGE
+from .models import Post, Tag, Upload, User, post_tags
+from .pagination import POSTS_PER_PAGE, encode_cursor
+from .search import create_search_index, index_post_for_search, rebuild_search_index
+from .tags import repair_tag_stats
+from .users import repair_author_stats
+
+#___sql statement budget___
+#upper bound of statements per route; check-query-budget fails when a route goes over,
+#which is what an N+1 regression on a listing looks like
+QUERY_BUDGETS = {
+    'index': 4,
+    'search': 5,
+    'posts_by_tags': 4,
+    'dashboard': 4,
+    'user_profile': 4,
+}
+
+@contextmanager
+def count_queries():
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', before_cursor_execute)
+
+def seed_query_budget_data(posts=3 * POSTS_PER_PAGE):
+    authors = []
+    for i in range(3):
+        author = User(username=f'budget{i}', email=f'budget{i}@example.com')
+        author.set_password(secrets.token_hex(8))
+        db.session.add(author)
+        authors.append(author)
+    tags = [Tag(tag_name=f'budget{i}') for i in range(4)]
+    db.session.add_all(tags)
+    for i in range(posts):
+        post = Post(title=f'Budget post {i}', content=f'<p>budget content {i}</p>',
+                    author=authors[i % len(authors)], creation_date=datetime.now(),
+                    tags=[tags[i % len(tags)], tags[(i + 1) % len(tags)]])
+        db.session.add(post)
+        db.session.flush()
+        index_post_for_search(post)
+    db.session.commit()
+    repair_tag_stats()
+    repair_author_stats()
+    return authors[0], tags[0]
+
+#both checks seed the same small data set into an empty scratch database
+def prepare_check_database(command_name):
+    db.create_all()
+    create_search_index()
+    if Post.query.first() is not None:
+        raise click.ClickException(f'{command_name} needs an empty database (set DATABASE_URL).')
+    return seed_query_budget_data()
+
+def get_as(user_id, url):
+    client = current_app.test_client()
+    if user_id is not None:
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['_fresh'] = True
+    #run the request in an empty context so it does not reuse the command's
+    #app context (and with it the session identity map and flask_login's g); streamed
+    #bodies are read in there too, their generator holds the request context
+    def get():
+        response = client.get(url)
+        response.get_data()
+        return response
+    return contextvars.Context().run(get)
+
+@click.command('check-query-budget')
+@with_appcontext
+def check_query_budget_command():
+    """Seed an empty scratch database and check SQL statements per route.
+
+    Run it against a throwaway database, e.g.
+    DATABASE_URL=sqlite:////tmp/budget.sqlite flask --app app check-query-budget
+    """
+    author, tag = prepare_check_database('check-query-budget')
+    with current_app.test_request_context():
+        checks = [
+            ('index', None, url_for('blog.index')),
+            ('search', None, url_for('blog.index', q='budget')),
+            ('posts_by_tags', None, url_for('blog.posts_by_tags', tag_name=tag.tag_name)),
+            ('dashboard', author.id, url_for('blog.dashboard')),
+            ('user_profile', None, url_for('users.user_profile', username=author.username)),
+        ]
+    failed = False
+    for name, user_id, url in checks:
+        with count_queries() as statements:
+            response = get_as(user_id, url)
+        budget = QUERY_BUDGETS[name]
+        ok = response.status_code == 200 and len(statements) <= budget
+        failed = failed or not ok
+        click.echo(f"{'ok  ' if ok else 'FAIL'} {name}: {len(statements)} statements "
+                   f"(budget {budget}), status {response.status_code}")
+    if failed:
+        raise SystemExit(1)
+
+#___query plans___
+#check-query-plans replays every SELECT a route runs under EXPLAIN QUERY PLAN and fails
+#on a full table scan ("SCAN post"), i.e. a listing that lost its index. walking an
+#index in order ("SCAN post USING INDEX ...", stopped early by the LIMIT) and the fts
+#virtual table are fine
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+#pages that list a whole table on purpose (about shows every user)
+FULL_SCAN_ALLOWED = {'about': {'user'}}
+
+def full_table_scans(connection, statement, parameters):
+    plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    return [row[-1] for row in plan if FULL_SCAN.match(row[-1])]
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """Seed an empty scratch database and check the routes' queries use indexes.
+
+    Run it against a throwaway database, e.g.
+    DATABASE_URL=sqlite:////tmp/plans.sqlite flask --app app check-query-plans
+    """
+    author, tag = prepare_check_database('check-query-plans')
+    newest = Post.query.order_by(Post.creation_date.desc(), Post.id.desc()).limit(POSTS_PER_PAGE).all()
+    with current_app.test_request_context():
+        checks = [
+            ('index', None, url_for('blog.index')),
+            ('index_next_page', None, url_for('blog.index', after=encode_cursor(newest[-1].creation_date, newest[-1].id))),
+            ('search', None, url_for('blog.index', q='budget')),
+            ('posts_by_tags', None, url_for('blog.posts_by_tags', tag_name=tag.tag_name)),
+            ('dashboard', author.id, url_for('blog.dashboard')),
+            ('user_profile', None, url_for('users.user_profile', username=author.username)),
+            ('view_post', None, url_for('blog.view_post', post_id=newest[0].id)),
+            ('about', None, url_for('blog.about')),
+            ('gallery', author.id, url_for('gallery.gallery')),
+            ('site_feed', None, url_for('feeds.site_feed', fmt='atom')),
+            ('tag_feed', None, url_for('feeds.tag_feed', tag_name=tag.tag_name, fmt='rss')),
+            ('author_feed', None, url_for('feeds.author_feed', username=author.username, fmt='atom')),
+            ('sitemap_shard', None, url_for('sitemaps.sitemap_shard', kind='posts', shard=0)),
+        ]
+    db.session.rollback()
+    #sitemap shards are written to disk while they are served: keep them out of the instance folder
+    sitemap_folder = tempfile.TemporaryDirectory()
+    current_app.config['SITEMAP_FOLDER'] = sitemap_folder.name
+    failed = False
+    for name, user_id, url in checks:
+        with count_queries() as statements:
+            response = get_as(user_id, url)
+        with db.engine.connect() as connection:
+            scans = [(statement, detail) for statement, parameters in statements
+                     if statement.lstrip().upper().startswith('SELECT')
+                     for detail in full_table_scans(connection, statement, parameters)
+                     if FULL_SCAN.match(detail).group(1) not in FULL_SCAN_ALLOWED.get(name, ())]
+        ok = response.status_code == 200 and not scans
+        failed = failed or not ok
+        click.echo(f"{'ok  ' if ok else 'FAIL'} {name}: {len(statements)} statements, "
+                   f"{len(scans)} full scans, status {response.status_code}")
+        for statement, detail in scans:
+            statement = ' '.join(statement.split())
+            click.echo(f"     {detail}: ...{statement[statement.find(' FROM '):][:160]}")
+    sitemap_folder.cleanup()
+    if failed:
+        raise SystemExit(1)
+
+#___synthetic data and route benchmark___
+#seed fills an empty database with generated users, tags, posts and upload rows (no
+#image files) using batched inserts; bench drives the test client over the main routes
+SEED_WORDS = ('flask', 'python', 'sqlite', 'cache', 'image', 'gallery', 'travel', 'recipe',
+              'garden', 'music', 'notes', 'design', 'server', 'mountain', 'coffee', 'review',
+              'guide', 'story', 'photo', 'weekend')
+
+def seed_sentence(rng, words=12):
+    return ' '.join(rng.choice(SEED_WORDS) for _ in range(words)).capitalize() + '.'
+
+def insert_rows(table, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(table.insert(), rows[start:start + batch_size])
+    db.session.commit()
+
+def seed_benchmark_data(users, posts, tags, tags_per_post, uploads, rng, batch_size=1000):
+    password_hash = generate_password_hash(secrets.token_hex(8))
+    now = datetime.now()
+    insert_rows(User.__table__, [
+        {'username': f'seed_user_{i}', 'email': f'seed_user_{i}@example.com',
+         'password_hash': password_hash, 'profile_picture': 'default.png', 'role': 'contributor',
+         'is_admin': False, 'is_banned': False}
+        for i in range(users)], batch_size)
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).filter(User.username.like('seed_user_%'))]
+    insert_rows(Tag.__table__, [{'tag_name': f'{SEED_WORDS[i % len(SEED_WORDS)]}-{i}'} for i in range(tags)], batch_size)
+    tag_ids = [tag_id for (tag_id,) in db.session.query(Tag.id)]
+
+    for start in range(0, posts, batch_size):
+        first_id = (db.session.query(db.func.max(Post.id)).scalar() or 0) + 1
+        rows, links = [], []
+        for i in range(start, min(start + batch_size, posts)):
+            content = ''.join(f'<p>{seed_sentence(rng, 40)}</p>' for _ in range(rng.randint(2, 6)))
+            created = now - timedelta(minutes=posts - i)
+            rows.append({'title': seed_sentence(rng, 6)[:-1], 'content': content,
+                         'excerpt': make_excerpt(content), 'summary': make_summary(content),
+                         'user_id': rng.choice(user_ids), 'creation_date': created, 'updated_at': created})
+            post_id = first_id + len(rows) - 1
+            links.extend({'post_id': post_id, 'tag_id': tag_id}
+                         for tag_id in rng.sample(tag_ids, min(tags_per_post, len(tag_ids))))
+        db.session.execute(Post.__table__.insert(), rows)
+        if links:
+            db.session.execute(post_tags.insert(), links)
+        db.session.commit()
+
+    insert_rows(Upload.__table__, [
+        {'filename': hashlib.sha256(f'seed upload {i}'.encode()).hexdigest() + '.jpg',
+         'sha256': hashlib.sha256(f'seed upload {i}'.encode()).hexdigest(), 'ref_count': 1,
+         'gallery_count': 1, 'size': rng.randint(50_000, 3_000_000), 'width': 1600, 'height': 1200,
+         'user_id': rng.choice(user_ids), 'created_at': now - timedelta(minutes=uploads - i)}
+        for i in range(uploads)], batch_size)
+    rebuild_search_index()
+    rebuild_feed_entries()
+    repair_tag_stats()
+    repair_author_stats()
+
+@click.command('seed')
+@with_appcontext
+@click.option('--users', default=20, help='Number of users.')
+@click.option('--posts', default=1000, help='Number of posts.')
+@click.option('--tags', default=100, help='Number of distinct tags.')
+@click.option('--tags-per-post', default=3, help='Tags attached to every post.')
+@click.option('--uploads', default=200, help='Number of gallery upload rows.')
+@click.option('--seed', 'random_seed', default=1, help='Random seed, the same seed gives the same data.')
+def seed_command(users, posts, tags, tags_per_post, uploads, random_seed):
+    """Fill an empty database with synthetic data for benchmarks.
+
+    DATABASE_URL=sqlite:////tmp/bench.sqlite flask --app app seed --posts 100000
+    """
+    db.create_all()
+    create_search_index()
+    if Post.query.first() is not None:
+        raise click.ClickException('seed needs an empty database (set DATABASE_URL).')
+    started = time.perf_counter()
+    seed_benchmark_data(max(users, 1), posts, tags, tags_per_post, uploads, random.Random(random_seed))
+    click.echo(f'Seeded {users} users, {posts} posts, {tags} tags and {uploads} uploads '
+               f'in {time.perf_counter() - started:.1f}s.')
+
+BENCH_ROUTES = ('index', 'view_post', 'posts_by_tags', 'gallery', 'search')
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+#urls for one route: random posts, tags and words, cursors into deep index pages
+def bench_urls(route, count, rng):
+    posts = db.session.query(Post.id, Post.creation_date).all()
+    if route == 'index':
+        return [url_for('blog.index', after=encode_cursor(*reversed(rng.choice(posts))) if posts and i % 2 else None)
+                for i in range(count)]
+    if route == 'view_post':
+        return [url_for('blog.view_post', post_id=rng.choice(posts)[0]) for _ in range(count)]
+    if route == 'posts_by_tags':
+        tag_names = [name for (name,) in db.session.query(Tag.tag_name)]
+        return [url_for('blog.posts_by_tags', tag_name=rng.choice(tag_names)) for _ in range(count)]
+    if route == 'gallery':
+        pages = max(1, math.ceil(Upload.query.count() / IMAGES_PER_PAGE))
+        return [url_for('gallery.gallery', page=rng.randint(1, pages)) for _ in range(count)]
+    return [url_for('blog.index', q=rng.choice(SEED_WORDS)) for _ in range(count)]
+
+def bench_route(route, urls, warmup, user_id=None, clear_caches=False):
+    client = current_app.test_client()
+    if user_id is not None:
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['_fresh'] = True
+    for url in urls[:warmup]:
+        contextvars.Context().run(client.get, url)
+    latencies, statement_counts, errors = [], [], 0
+    started = time.perf_counter()
+    for url in urls[warmup:]:
+        if clear_caches:
+            for cache in CACHES.values():
+                cache.clear()
+        with count_queries() as statements:
+            request_started = time.perf_counter()
+            response = contextvars.Context().run(client.get, url)
+            latencies.append((time.perf_counter() - request_started) * 1000)
+        statement_counts.append(len(statements))
+        errors += response.status_code != 200
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'sql_per_request': round(sum(statement_counts) / len(statement_counts), 2),
+        'max_sql': max(statement_counts),
+        'errors': errors,
+    }
+
+@click.command('bench')
+@with_appcontext
+@click.option('--route', 'routes', multiple=True, type=click.Choice(BENCH_ROUTES), help='Route to run, repeatable (default: all).')
+@click.option('--requests', 'request_count', default=200, help='Measured requests per route.')
+@click.option('--warmup', default=20, help='Unmeasured requests per route before measuring.')
+@click.option('--clear-caches', is_flag=True, help='Empty the in-process caches before every request.')
+@click.option('--seed', 'random_seed', default=1, help='Random seed for the urls.')
+@click.option('--json', 'json_path', default=None, help='Write the results as JSON to this file (- for stdout).')
+def bench_command(routes, request_count, warmup, clear_caches, random_seed, json_path):
+    """Measure latency, throughput and SQL statements of the main routes.
+
+    Run it against a seeded database, e.g.
+    DATABASE_URL=sqlite:////tmp/bench.sqlite flask --app app bench --json run.json
+    """
+    rng = random.Random(random_seed)
+    user_id = db.session.query(db.func.min(User.id)).scalar()
+    with current_app.test_request_context():
+        if Post.query.first() is None:
+            raise click.ClickException('bench needs a seeded database (see the seed command).')
+        plans = [(route, bench_urls(route, warmup + request_count, rng)) for route in routes or BENCH_ROUTES]
+        posts = Post.query.count()
+    results = {}
+    for route, urls in plans:
+        #the gallery needs a login, the other routes are measured as an anonymous visitor
+        results[route] = bench_route(route, urls, warmup, user_id if route == 'gallery' else None, clear_caches)
+        if json_path != '-':
+            r = results[route]
+            click.echo(f"{route:14} p50 {r['p50_ms']:>8} ms  p95 {r['p95_ms']:>8} ms  p99 {r['p99_ms']:>8} ms  "
+                       f"{r['requests_per_second']:>8} req/s  {r['sql_per_request']:>5} sql/req  errors {r['errors']}")
+    if json_path:
+        report = json.dumps({'created_at': datetime.now().isoformat(timespec='seconds'), 'posts': posts,
+                             'requests': request_count, 'clear_caches': clear_caches, 'routes': results}, indent=2)
+        if json_path == '-':
+            click.echo(report)
+        else:
+            with open(json_path, 'w') as f:
+                f.write(report + '\n')
+
+#___asgi adapter___
+#check-asgi sends requests through AsgiAdapter to a throwaway app that answers with the
+#size of the body it read: with a Content-Length, and without one with the body split
+#over several messages, which is how uvicorn passes on a chunked request
+ASGI_CHECKS = (
+    ('content_length', [b'x' * 20], [(b'content-length', b'20')], 200, b'20'),
+    ('chunked', [b'x' * 8, b'x' * 12], [(b'transfer-encoding', b'chunked')], 200, b'20'),
+    ('chunked_spooled', [b'x' * 30] * 3, [(b'transfer-encoding', b'chunked')], 200, b'90'),
+    ('chunked_form', [b'title=a&', b'content=b'], [(b'transfer-encoding', b'chunked'),
+     (b'content-type', b'application/x-www-form-urlencoded')], 200, b'2'),
+    ('chunked_too_large', [b'x' * 600] * 2, [(b'transfer-encoding', b'chunked')], 413, None),
+)
+
+def asgi_echo_app():
+    app = Flask(__name__)
+    app.config.update(ASGI_THREADS=2, ASGI_SPOOL_SIZE=64, MAX_CONTENT_LENGTH=1024)
+
+    @app.post('/echo')
+    def echo():
+        return str(len(request.form) if request.form else len(request.get_data()))
+    return app
+
+def asgi_post(adapter, chunks, headers):
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/echo', 'query_string': b'',
+             'http_version': '1.1', 'headers': headers}
+    asyncio.run(adapter(scope, receive, send))
+    return sent[0]['status'], b''.join(message.get('body', b'') for message in sent[1:])
+
+@click.command('check-asgi')
+def check_asgi_command():
+    """Check that the ASGI adapter passes request bodies on to the views."""
+    adapter = AsgiAdapter(asgi_echo_app())
+    failed = False
+    try:
+        for name, chunks, headers, status, body in ASGI_CHECKS:
+            got_status, got_body = asgi_post(adapter, chunks, headers)
+            ok = got_status == status and (body is None or got_body == body)
+            failed = failed or not ok
+            click.echo(f"{'ok  ' if ok else 'FAIL'} {name}: status {got_status}, "
+                       f"body {got_body[:40]!r} (expected {status} {body!r})")
+    finally:
+        adapter.executor.shutdown()
+    if failed:
+        raise SystemExit(1)
+
+#___sqlite profile benchmark___
+#read throughput while one thread keeps writing, on a scratch database: once with
+#sqlite defaults and a single pool, once with the profile from database.py and the
+#readonly pool
+def run_sqlite_benchmark(path, tuned, seconds, readers, pragmas):
+    writer = create_engine(f'sqlite:///{path}')
+    reader = create_engine(readonly_sqlite_uri(path)) if tuned else writer
+    if tuned:
+        use_sqlite_profile(writer, pragmas)
+        use_sqlite_profile(reader, pragmas, readonly=True)
+    with writer.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE bench_post (id INTEGER PRIMARY KEY, title TEXT, body TEXT)')
+        conn.execute(text('INSERT INTO bench_post (title, body) VALUES (:title, :body)'),
+                     [{'title': f'post {i}', 'body': 'x' * 500} for i in range(2000)])
+
+    stop = threading.Event()
+    results = {'reads': [0] * readers, 'writes': [0], 'errors': [0] * (readers + 1)}
+
+    def read_loop(index):
+        while not stop.is_set():
+            try:
+                with reader.connect() as conn:
+                    conn.execute(text('SELECT id, title FROM bench_post ORDER BY id DESC LIMIT 20')).all()
+                results['reads'][index] += 1
+            except OperationalError:
+                results['errors'][index] += 1
+
+    def write_loop():
+        while not stop.is_set():
+            try:
+                with writer.begin() as conn:
+                    conn.execute(text('INSERT INTO bench_post (title, body) VALUES (:title, :body)'),
+                                 {'title': 'new post', 'body': 'y' * 500})
+                results['writes'][0] += 1
+            except OperationalError:
+                results['errors'][readers] += 1
+
+    threads = [threading.Thread(target=read_loop, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=write_loop))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    writer.dispose()
+    reader.dispose()
+    return {
+        'reads_per_second': round(sum(results['reads']) / seconds, 1),
+        'writes_per_second': round(results['writes'][0] / seconds, 1),
+        'errors': sum(results['errors']),
+    }
+
+@click.command('bench-sqlite')
+@with_appcontext
+@click.option('--seconds', default=5.0, help='Duration of each run.')
+@click.option('--readers', default=4, help='Number of reader threads.')
+def bench_sqlite_command(seconds, readers):
+    """Compare read throughput during writes with and without the sqlite profile."""
+    for label, tuned in (('default', False), ('tuned', True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            result = run_sqlite_benchmark(os.path.join(tmp, 'bench.sqlite'), tuned, seconds, readers,
+                                              current_app.config['SQLITE_PRAGMAS'])
+        click.echo(f"{label:8} reads/s {result['reads_per_second']:>10}  "
+                   f"writes/s {result['writes_per_second']:>8}  errors {result['errors']}")
+
+#___startup benchmark___
+#cold start of a worker: a fresh interpreter imports the package and builds the app
+#under `python -X importtime`. reports the wall time, the modules with the most import
+#time of their own (cumulative times mostly blame whichever module imports flask or
+#sqlalchemy first) and whether any of the modules that are meant to load lazily got imported anyway
+LAZY_MODULES = ('PIL', 'bleach', 'flask_migrate', 'alembic', 'flaskblog.benchmarks')
+
+STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from flaskblog import create_app
+imported = time.perf_counter()
+create_app()
+done = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'create_app_ms': (done - imported) * 1000,
+                  'loaded': [name for name in %r if name in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+#`import time: self [us] | cumulative | name`
+def parse_importtime(stderr):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('imported package'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append({'name': name.strip(), 'self_ms': int(self_us) / 1000, 'cumulative_ms': int(cumulative_us) / 1000})
+    return imports
+
+def run_startup_probe(root_path):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_PROBE],
+                            cwd=root_path, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise click.ClickException(f'startup probe failed:\n{result.stderr[-2000:]}')
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['wall_ms'] = wall_ms
+    report['imports'] = parse_importtime(result.stderr)
+    return report
+
+@click.command('bench-startup')
+@with_appcontext
+@click.option('--runs', default=5, help='Number of cold starts, the median is reported.')
+@click.option('--top', default=15, help='Number of slowest imports to list.')
+@click.option('--json', 'json_path', default=None, help='Write the results as JSON to this file (- for stdout).')
+def bench_startup_command(runs, top, json_path):
+    """Measure the cold-start cost of importing the package and calling create_app()."""
+    reports = [run_startup_probe(current_app.root_path) for _ in range(max(runs, 1))]
+    median = {key: round(statistics.median(report[key] for report in reports), 1)
+              for key in ('wall_ms', 'import_ms', 'create_app_ms')}
+    imports = reports[len(reports) // 2]['imports']
+    slowest = sorted(imports, key=lambda entry: entry['self_ms'], reverse=True)[:top]
+    loaded = sorted(set().union(*(report['loaded'] for report in reports)))
+    if json_path:
+        report = json.dumps({'created_at': datetime.now().isoformat(timespec='seconds'), 'runs': len(reports),
+                             **median, 'modules_imported': len(imports), 'lazy_modules_loaded': loaded,
+                             'slowest_imports': slowest}, indent=2)
+        if json_path == '-':
+            click.echo(report)
+            return
+        with open(json_path, 'w') as f:
+            f.write(report + '\n')
+    click.echo(f"process {median['wall_ms']} ms  import {median['import_ms']} ms  "
+               f"create_app {median['create_app_ms']} ms  ({len(imports)} modules, median of {len(reports)} runs)")
+    for entry in slowest:
+        click.echo(f"{entry['self_ms']:>8.1f} ms self {entry['cumulative_ms']:>8.1f} ms cumulative  {entry['name']}")
+    click.echo(f"lazy modules loaded at startup: {', '.join(loaded) or 'none'}")
+
+#___serving benchmark___
+#the same mixed workload against the app served by sync workers (gunicorn) and by the
+#asgi adapter (uvicorn), with the same number of worker processes. uploaders send a
+#gallery upload at a fixed byte rate, like visitors on slow connections, while readers
+#fetch listing and post pages as fast as they are answered. the uploads are rejected by
+#the content check once the whole body has arrived, so a run leaves no files behind
+SERVE_COMMANDS = {
+    'wsgi': lambda port, workers: [sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+                                   '--bind', f'127.0.0.1:{port}', 'app:app'],
+    'asgi': lambda port, workers: [sys.executable, '-m', 'uvicorn', '--workers', str(workers),
+                                   '--port', str(port), '--no-access-log', 'asgi:app'],
+}
+SERVE_READ_ROUTES = ('index', 'view_post', 'posts_by_tags')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_server(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise click.ClickException(f'server exited with status {process.returncode}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/about')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise click.ClickException('server did not start')
+
+def slow_upload(port, cookie, size, rate, piece_size=16 * 1024):
+    boundary = secrets.token_hex(16)
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="image_file"; filename="bench.jpg"\r\n'
+            'Content-Type: image/jpeg\r\n\r\n').encode()
+    tail = f'\r\n--{boundary}--\r\n'.encode()
+    body = head + os.urandom(size) + tail
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    conn.putrequest('POST', '/gallery')
+    conn.putheader('Content-Type', f'multipart/form-data; boundary={boundary}')
+    conn.putheader('Content-Length', str(len(body)))
+    conn.putheader('Cookie', cookie)
+    conn.endheaders()
+    for start in range(0, len(body), piece_size):
+        conn.send(body[start:start + piece_size])
+        time.sleep(piece_size / rate)
+    status = conn.getresponse().status
+    conn.close()
+    return status
+
+def run_serve_workload(port, cookie, urls, seconds, readers, uploaders, upload_size, upload_rate):
+    stop = threading.Event()
+    lock = threading.Lock()
+    results = {'read_ms': [], 'upload_s': [], 'errors': 0}
+
+    def record(key, value, ok):
+        with lock:
+            results[key].append(value)
+            results['errors'] += not ok
+
+    def read_loop(rng):
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                conn.request('GET', rng.choice(urls))
+                ok = conn.getresponse().status == 200
+                conn.close()
+            except OSError:
+                ok = False
+            record('read_ms', (time.perf_counter() - started) * 1000, ok)
+
+    def upload_loop():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                #a rejected upload is answered with a redirect back to the gallery
+                ok = slow_upload(port, cookie, upload_size, upload_rate) == 302
+            except OSError:
+                ok = False
+            record('upload_s', time.perf_counter() - started, ok)
+
+    threads = [threading.Thread(target=read_loop, args=(random.Random(i),)) for i in range(readers)]
+    threads += [threading.Thread(target=upload_loop) for _ in range(uploaders)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    reads = results['read_ms'] or [0]
+    return {
+        'reads': len(results['read_ms']),
+        'reads_per_second': round(len(results['read_ms']) / seconds, 1),
+        'read_p50_ms': round(percentile(reads, 50), 1),
+        'read_p95_ms': round(percentile(reads, 95), 1),
+        'read_p99_ms': round(percentile(reads, 99), 1),
+        'uploads': len(results['upload_s']),
+        'upload_mean_s': round(sum(results['upload_s']) / len(results['upload_s']), 2) if results['upload_s'] else None,
+        'errors': results['errors'],
+    }
+
+@click.command('bench-serve')
+@with_appcontext
+@click.option('--server', 'servers', multiple=True, type=click.Choice(sorted(SERVE_COMMANDS)), help='Server to run, repeatable (default: both).')
+@click.option('--workers', default=2, help='Worker processes per server.')
+@click.option('--readers', default=4, help='Concurrent readers.')
+@click.option('--uploaders', default=8, help='Concurrent slow uploads.')
+@click.option('--upload-size', default=512 * 1024, help='Bytes per upload.')
+@click.option('--upload-rate', default=256 * 1024, help='Bytes per second sent by each uploader.')
+@click.option('--seconds', default=10.0, help='Duration of each run.')
+@click.option('--json', 'json_path', default=None, help='Write the results as JSON to this file (- for stdout).')
+def bench_serve_command(servers, workers, readers, uploaders, upload_size, upload_rate, seconds, json_path):
+    """Compare sync (WSGI) and async (ASGI) serving under slow uploads and reads.
+
+    Needs gunicorn and uvicorn, and a seeded database, e.g.
+    DATABASE_URL=sqlite:////tmp/bench.sqlite flask --app app bench-serve
+    """
+    user_id = db.session.query(db.func.min(User.id)).scalar()
+    with current_app.test_request_context():
+        if Post.query.first() is None:
+            raise click.ClickException('bench-serve needs a seeded database (see the seed command).')
+        rng = random.Random(1)
+        urls = [url for route in SERVE_READ_ROUTES for url in bench_urls(route, 50, rng)]
+    #writer transactions start with BEGIN IMMEDIATE: end this one so the servers can write
+    db.session.rollback()
+    serializer = current_app.session_interface.get_signing_serializer(current_app)
+    cookie = f"{current_app.config['SESSION_COOKIE_NAME']}={serializer.dumps({'_user_id': str(user_id), '_fresh': True})}"
+    results = {}
+    for server in servers or ('wsgi', 'asgi'):
+        port = free_port()
+        process = subprocess.Popen(SERVE_COMMANDS[server](port, workers), cwd=current_app.root_path,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(port, process)
+            results[server] = run_serve_workload(port, cookie, urls, seconds, readers, uploaders,
+                                                 upload_size, upload_rate)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        if json_path != '-':
+            r = results[server]
+            click.echo(f"{server:5} reads/s {r['reads_per_second']:>8}  p50 {r['read_p50_ms']:>8} ms  "
+                       f"p95 {r['read_p95_ms']:>8} ms  p99 {r['read_p99_ms']:>8} ms  "
+                       f"uploads {r['uploads']:>4} (mean {r['upload_mean_s']} s)  errors {r['errors']}")
+    if json_path:
+        report = json.dumps({'created_at': datetime.now().isoformat(timespec='seconds'), 'workers': workers,
+                             'readers': readers, 'uploaders': uploaders, 'upload_size': upload_size,
+                             'upload_rate': upload_rate, 'seconds': seconds, 'servers': results}, indent=2)
+        if json_path == '-':
+            click.echo(report)
+        else:
+            with open(json_path, 'w') as f:
+                f.write(report + '\n')
+
+def init_app(app):
+    for command in (check_query_budget_command, check_query_plans_command, check_asgi_command, seed_command,
+                    bench_command, bench_sqlite_command, bench_startup_command, bench_serve_command):
+        app.cli.add_command(command)
@@ -0,0 +1,337 @@
+from datetime import datetime
+from flask import Blueprint, current_app, flash, redirect, render_template, request, session, url_for
+from flask_login import current_user, login_required
+from sqlalchemy.orm import joinedload, selectinload
+
+from .caches import can_use_page_cache, invalidate_inbox, invalidate_post_page, view_post_cache
+from .content import make_excerpt, make_summary, render_content_for_preview, sanitize_html
+from .database import db
+from .feeds import remove_feed_entry, store_feed_entry
+from .forms import ContactForm
+from .httpcache import conditional_response, listing_etag, page_etag
+from .models import ContactMessage, Post, Tag, User
+from .pagination import paginate_posts, post_detail_options
+from .search import index_post_for_search, remove_post_from_search, search_posts
+from .tags import delete_orphan_tags, parse_tags, resolve_tags, set_post_tags, top_tags
+from .uploads import allowed_file, process_upload_later, release_upload, save_picture
+from .users import record_post_created, record_post_deleted
+
+bp = Blueprint('blog', __name__)
+
+@bp.route('/')
+@bp.route('/index')
+def index():
+    search_query = request.args.get('q', type=str)
+    
+    if search_query:
+        page = request.args.get('page', 1, type=int)
+        posts = search_posts(search_query, page=page)
+    else:
+        search_query = ""
+        posts = paginate_posts(Post.query, count_key='index')
+    tags = top_tags()
+    return conditional_response(
+        listing_etag(posts, search_query, posts.total if search_query else None, tags),
+        None,
+        lambda: render_template('index.html', posts=posts, search_query=search_query, top_tags=tags))
+
+#PROTECTED ROUTE -DASHBOARD
+@bp.route('/dashboard')
+@login_required
+def dashboard():
+    user_posts = paginate_posts(Post.query.filter_by(user_id=current_user.id), count_key=f'dashboard:{current_user.id}')
+    return render_template('dashboard.html', title='dashboard', user_posts=user_posts)
+
+@bp.route("/post/new", methods=['GET', 'POST'])
+@login_required 
+def create_post():
+    if request.method == 'POST':
+        # print(f'DEBUG: request.files content {request.files}') #DEBUG!!!!!!!!
+        title = request.form.get('post_title')
+        content = request.form.get('text_content')
+        tags_string = request.form.get('tags_input', '')
+        
+        # picture_file = 'default.jpg'
+        new_post_image_file = None
+        
+        if not title:
+            flash('Title cannot be empty!', 'error')
+            return render_template('create_post.html', title='Crea Post',
+                                   post_title=title, post_content=content,
+                                   post_tags=tags_string) 
+            
+        if not content:
+            flash('Content cannot be empty', 'error')
+            return render_template('create_post.html', title='Crea Post',
+                                   post_title=title, post_content=content,
+                                   post_tags=tags_string) 
+        
+        #file uploading logic
+        
+        if 'post_picture' in request.files:
+            picture = request.files['post_picture']
+            if picture.filename != '':
+                if allowed_file(picture.filename):
+                    try:
+                        new_post_upload = save_picture(picture, uploader=current_user)
+                        new_post_image_file = new_post_upload.filename
+                    except Exception as e:
+                        flash(f'Error during uploading image: {e}')
+                        print(f'Error during uploading file {e}')
+                        return render_template('create_post.html', title='Create new post', 
+                                               post_title=title, post_content=content,
+                                               post_tags=tags_string)
+                else:
+                    flash('File type not supported (png, jpg, jpeg, gif, webp)', 'error')
+                    return render_template('create_post.html', title='Create post',
+                                           post_title=title, post_content=content,
+                                           post_tags=tags_string)  
+    
+        
+        try:
+            sanitized_content = sanitize_html(content)
+            new_post = Post(
+                title=title,
+                content=sanitized_content,
+                excerpt=make_excerpt(sanitized_content),
+                summary=make_summary(sanitized_content),
+                user_id=current_user.id,
+                creation_date=datetime.now(),
+                image_file=new_post_image_file
+            )
+            
+            db.session.add(new_post)
+            if new_post_image_file:
+                new_post.image_width = new_post_upload.width
+                new_post.image_height = new_post_upload.height
+                if new_post_upload.post_id is None:
+                    new_post_upload.post = new_post
+            
+            db.session.flush()
+            set_post_tags(new_post, resolve_tags(parse_tags(tags_string)))
+            index_post_for_search(new_post)
+            store_feed_entry(new_post)
+            record_post_created(new_post)
+            db.session.commit()
+            if new_post_image_file:
+                process_upload_later(new_post_upload, post_id=new_post.id)
+            
+            flash('Your post has been successfully added!', 'success')
+            return redirect(url_for('blog.view_post', post_id=new_post.id))
+        
+        except Exception as e:
+            db.session.rollback()
+            flash('An error occurred', 'error')
+            current_app.logger.error(f'Error during the creation of post: {e}')
+            return render_template('create_post.html', title='Create post', post_title=title, post_content=content, post_tags=tags_string)
+
+    return render_template('create_post.html', title='Create post')
+
+#defining a route for viewing a single text
+@bp.route('/view/<int:post_id>')
+def view_post(post_id):
+    cacheable = can_use_page_cache()
+    cache_key = (post_id, request.host)
+    if cacheable:
+        cached = view_post_cache.get(cache_key)
+        if cached is not None:
+            rendered, _, etag, last_modified = cached
+            return conditional_response(etag, last_modified, lambda: rendered)
+    post = Post.query.options(*post_detail_options()).get_or_404(post_id)
+    etag = page_etag(post.id, post.updated_at, post.author.username)
+
+    def render():
+        rendered = render_template('view.html', post=post)
+        if cacheable:
+            view_post_cache.set(cache_key, (rendered, post.user_id, etag, post.updated_at))
+        return rendered
+    return conditional_response(etag, post.updated_at, render)
+
+
+#delete post
+@bp.route('/delete/<int:post_id>', methods=['POST'])
+@login_required
+def delete(post_id):
+    post_to_delete = Post.query.get_or_404(post_id)
+    
+    if post_to_delete.user_id != current_user.id and not current_user.is_admin:
+        flash('Non hai il permesso per cancellare questo post', 'danger')
+        return redirect(url_for('blog.dashboard'))
+
+    try:
+
+        _, removed_tags = set_post_tags(post_to_delete, [])
+        delete_orphan_tags(removed_tags)
+        remove_post_from_search(post_to_delete.id)
+        remove_feed_entry(post_to_delete.id)
+        record_post_deleted(post_to_delete)
+        if post_to_delete.image_file:
+            release_upload(post_to_delete.image_file)
+        db.session.delete(post_to_delete)
+        db.session.commit() 
+        invalidate_post_page(post_id)
+        flash('Il post è stato cancellato con successo!', 'success')
+        return redirect(url_for('blog.dashboard'))
+        
+    except Exception as e:
+        db.session.rollback()
+        flash('Errore durante la cancellazione', 'error')
+        print(f'Errore durante la cancellazione di {post_id}: {e}')
+        return 'Error during the elimination of the content', 500
+
+    
+#edit post
+@bp.route('/post/<int:post_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_post(post_id):
+    if request.method == 'POST':
+        #parse the body (spooling the picture) before the lookup takes the write lock
+        request.files
+    post = Post.query.get_or_404(post_id)
+    
+    if post.user_id != current_user.id and not current_user.is_admin:
+        flash('You do not have the authorization to edit this post', 'danger')
+        return redirect(url_for('blog.dashboard'))
+    
+    if request.method == 'POST':
+        # print(f'DEBUG: request.files content {request.files}') #DEBUG!!!!!!!!
+        post.title = request.form.get('title')
+        content = request.form.get('content')
+        tags_string = request.form.get('tags_input', '')
+        
+        sanitized_content = sanitize_html(content)
+        new_image_upload = None
+        
+        #image upload logic
+        if 'post_picture' in request.files:
+            picture = request.files['post_picture']
+            
+            if picture.filename != '':
+                if allowed_file(picture.filename):
+                    try:
+                        #save first: releasing the old image before could drop the very
+                        #file an identical re-upload is about to reuse
+                        new_image_upload = save_picture(picture, uploader=current_user)
+                        if new_image_upload.post_id is None:
+                            new_image_upload.post = post
+                        old_image_file = post.image_file
+                        post.image_file = new_image_upload.filename
+                        post.image_width = new_image_upload.width
+                        post.image_height = new_image_upload.height
+                        if old_image_file and old_image_file != 'default.jpg':
+                            release_upload(old_image_file)
+                            current_app.logger.info(f'Old image {old_image_file} released')
+                    except Exception as e:
+                        current_app.logger.error(f'error during saving new picture: {e}')
+                        flash('Error while uploading the image.', 'error')
+                        current_tags = ', '.join([t.tag_name for t in post.tags])
+                        return render_template('edit_post.html', title = 'Edit post',
+                                               post=post, current_tags=current_tags)
+                
+                else:
+                    flash('File type not allowed (accepting: jpg, jpeg, png, gif, webp)', 'danger')
+                    current_tags = ', '.join([t.tag_name for t in post.tags])
+                    return render_template('edit_post.html', title = 'Edit post',
+                                               post=post, current_tags=current_tags)
+        
+        post.content = sanitized_content
+        post.excerpt = make_excerpt(sanitized_content)
+        post.summary = make_summary(sanitized_content)
+        #tags are written to post_tags directly, so the row may not change otherwise
+        post.updated_at = datetime.now()
+
+        try:
+            _, removed_tags = set_post_tags(post, resolve_tags(parse_tags(tags_string)))
+            delete_orphan_tags(removed_tags)
+            index_post_for_search(post)
+            store_feed_entry(post)
+            db.session.commit()
+            invalidate_post_page(post.id)
+            if new_image_upload:
+                process_upload_later(new_image_upload, post_id=post.id)
+            flash('Your post have been successfully updated!', 'success')
+            return redirect(url_for('blog.view_post', post_id=post.id))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'An error occurred while editing the post: {e}', 'error')
+            current_app.logger.error(f'Error during updating the post {post.id}: {e}')
+            return render_template('edit_post.html', title='Edit post', post=post)
+    current_tags = ', '.join([tag.tag_name for tag in post.tags])
+    return render_template('edit_post.html', title = 'Edit post', post=post, current_tags=current_tags)
+    
+#route for posts by tags
+@bp.route('/tag/<string:tag_name>')
+def posts_by_tags(tag_name):
+    tag = Tag.query.options(joinedload(Tag.stat)).filter_by(tag_name=tag_name).first_or_404()
+    tagged_posts = paginate_posts(tag.posts.options(selectinload(Post.tags).joinedload(Tag.stat)),
+                                  count_key=f'tag:{tag.id}', total=tag.stat.post_count if tag.stat else None)
+    tag_counts = [(t.tag_name, t.stat.post_count if t.stat else 0) for post in tagged_posts for t in post.tags]
+    return conditional_response(
+        listing_etag(tagged_posts, tag_counts),
+        None,
+        lambda: render_template('tagged_post.html', title = f'Post with tag {tag.tag_name}', tag=tag, posts=tagged_posts))
+
+@bp.route('/contact', methods=['GET', 'POST'])
+def contact():
+    form = ContactForm() 
+
+    if request.method == 'GET':
+
+        session['correct_math_answer'] = form.correct_result
+
+        session['math_num1'] = form.num1
+        session['math_num2'] = form.num2
+        session['math_operation'] = form.operation
+        
+    elif form.validate_on_submit():
+       
+        correct_answer_from_session = session.pop('correct_math_answer', None) # .pop() rimuove la chiave dalla sessione dopo averla letta
+        
+        user_answer = form.math_question.data
+        if correct_answer_from_session is None or user_answer != correct_answer_from_session:
+            flash('Incorrect answer to the math question. Please try again.', 'danger')
+           
+            new_form = ContactForm()
+            session['correct_math_answer'] = new_form.correct_result
+            session['math_num1'] = new_form.num1
+            session['math_num2'] = new_form.num2
+            session['math_operation'] = new_form.operation
+            return render_template('contact.html', form=new_form)
+
+
+        new_message = ContactMessage(
+            name=form.name.data,
+            email=form.email.data,
+            subject=form.subject.data,
+            message=form.message.data
+        )
+        db.session.add(new_message)
+        db.session.commit()
+        invalidate_inbox()
+        flash('Your message has been sent successfully!', 'success')
+     
+        session.pop('correct_math_answer', None) 
+        session.pop('math_num1', None)
+        session.pop('math_num2', None)
+        session.pop('math_operation', None)
+        return redirect(url_for('blog.contact')) 
+    
+
+    return render_template('contact.html', form=form)
+
+#____about___ (for now a static page)
+@bp.route('/about')
+def about():
+    #only the columns the page shows
+    authors = db.session.query(User.username, User.role, User.bio).all()
+    return render_template("about.html", authors=authors)
+
+
+#___preview post___ !!!!!! TO CHECK
+@bp.route('/preview_post', methods=["POST"])
+def preview_post():
+    title = request.form.get('post_title') or request.form.get('title')
+    content = request.form.get('text_content') or request.form.get('content')
+    rendered_preview_content = render_content_for_preview(content)
+    author = current_user.username
+    return render_template('post_preview.html', title=title, content_html=rendered_preview_content, author=author)
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+from flask import session
+from flask_login import current_user
+import threading
+import time
+
+
+#bounded LRU with an optional ttl; the ttl bounds how long another worker process can
+#serve an entry that was invalidated elsewhere
+VIEW_CACHE_SIZE = 256
+VIEW_CACHE_TTL = 300
+
+class LRUCache:
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry else None
+
+    def pop_where(self, predicate):
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+#rendered view.html for anonymous visitors, keyed by (post id, host): the page embeds
+#external urls. values are (html, author id, etag, updated_at) so profile changes can
+#drop an author's pages
+view_post_cache = LRUCache(VIEW_CACHE_SIZE, ttl=VIEW_CACHE_TTL)
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 60
+user_cache = LRUCache(USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+#number of unread contact messages, shown to admins on the dashboard and the inbox
+INBOX_CACHE_TTL = 60
+inbox_cache = LRUCache(1, ttl=INBOX_CACHE_TTL)
+#assembled atom/rss documents keyed by their etag, which covers everything they show,
+#so entries never need invalidating
+FEED_CACHE_SIZE = 128
+feed_cache = LRUCache(FEED_CACHE_SIZE)
+#sitemap index document per url root
+SITEMAP_CACHE_TTL = 300
+sitemap_cache = LRUCache(8, ttl=SITEMAP_CACHE_TTL)
+#listing totals (count(*)) per query shape; search and filtered listings add one per term
+COUNT_CACHE_SIZE = 512
+COUNT_CACHE_TTL = 60
+count_cache = LRUCache(COUNT_CACHE_SIZE, ttl=COUNT_CACHE_TTL)
+CACHES = {'view_post': view_post_cache, 'users': user_cache, 'inbox': inbox_cache, 'feeds': feed_cache,
+          'sitemap': sitemap_cache, 'counts': count_cache}
+
+def can_use_page_cache():
+    return not current_user.is_authenticated and '_flashes' not in session
+
+def invalidate_post_page(post_id):
+    view_post_cache.pop_where(lambda key, value: key[0] == post_id)
+
+def invalidate_author_pages(user_id):
+    view_post_cache.pop_where(lambda key, value: value[1] == user_id)
+
+def invalidate_inbox():
+    inbox_cache.clear()
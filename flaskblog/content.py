@@ -0,0 +1,104 @@
+from html.parser import HTMLParser
+import html
+import re
+
+#cleaning HTML in input using bleach
+ALLOWED_TAGS = ['a', 'abbr', 'acronym', 'b', 'blockquote', 'code', 'em', 'i', 'li', 'ol', 'p',
+    'strong', 'ul', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'hr', 'img', 'div',
+    'span', 'pre', 'code']
+
+ALLOWED_ATTRIBUTES = {
+    'a': ['href', 'title'],
+    'abbr': ['title'],
+    'acronym': ['title'],
+    'img': ['src', 'alt', 'width', 'height', 'style', 'class'],
+    'div': ['class'],
+    'span': ['class']
+}
+
+#bleach (and html5lib below it) is imported on first use: only requests that write
+#or preview a post need it
+def sanitize_html(html_content):
+    import bleach
+    return bleach.clean(
+        html_content,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        strip=True,
+        strip_comments=True
+    )
+#rendering of html for preview
+def render_content_for_preview(text_content):
+    rendered_html = sanitize_html(text_content)
+    return rendered_html
+
+#plain text of (already sanitized) post html, used by search and summaries
+def html_to_text(html_content):
+    if not html_content:
+        return ''
+    plain = re.sub(r'<[^>]*>', ' ', html_content)
+    return ' '.join(html.unescape(plain).split())
+
+#excerpts are stored on the post so listings never load or cut the full content
+EXCERPT_LENGTH = 200
+SUMMARY_LENGTH = 150
+VOID_TAGS = {'br', 'hr', 'img'}
+
+#copies html until `limit` characters of text have been seen, then closes the open tags
+class ExcerptParser(HTMLParser):
+    def __init__(self, limit):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.length = 0
+        self.parts = []
+        self.open_tags = []
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        self.parts.append(self.get_starttag_text())
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if not self.done:
+            self.parts.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if self.done or tag not in self.open_tags:
+            return
+        index = len(self.open_tags) - 1 - self.open_tags[::-1].index(tag)
+        for open_tag in reversed(self.open_tags[index:]):
+            self.parts.append(f'</{open_tag}>')
+        del self.open_tags[index:]
+
+    def handle_data(self, data):
+        if self.done:
+            return
+        remaining = self.limit - self.length
+        if len(data) <= remaining:
+            self.parts.append(html.escape(data, quote=False))
+            self.length += len(data)
+            return
+        cut = data[:remaining]
+        if ' ' in cut:
+            cut = cut.rsplit(' ', 1)[0]
+        self.parts.append(html.escape(cut, quote=False) + '...')
+        self.done = True
+
+    def excerpt(self):
+        closing = ''.join(f'</{tag}>' for tag in reversed(self.open_tags))
+        return ''.join(self.parts) + closing
+
+def make_excerpt(html_content, length=EXCERPT_LENGTH):
+    parser = ExcerptParser(length)
+    parser.feed(html_content or '')
+    parser.close()
+    return sanitize_html(parser.excerpt())
+
+def make_summary(html_content, length=SUMMARY_LENGTH):
+    plain = html_to_text(html_content)
+    if len(plain) <= length:
+        return plain
+    return plain[:length - 3].rsplit(' ', 1)[0] + '...'
@@ -0,0 +1,73 @@
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+import os
+
+
+def sqlite_file_path(app, uri):
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:') \
+            or url.database.startswith('file:'):
+        return None
+    if os.path.isabs(url.database):
+        return url.database
+    #same rule as flask-sqlalchemy: relative paths live in the instance folder
+    return os.path.join(app.instance_path, url.database)
+
+def readonly_sqlite_uri(path):
+    return f'sqlite:///file:{path}?mode=ro&uri=true'
+
+#flushes always go to the writer; other statements of a GET request use the readonly pool
+class ReadWriteSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() \
+                and request.method in ('GET', 'HEAD') \
+                and 'readonly' in current_app.config.get('SQLALCHEMY_BINDS', {}):
+            return db.engines['readonly']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': ReadWriteSession})
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas, readonly=False):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        #the journal mode is stored in the file and can only be changed by a writer
+        if readonly and name == 'journal_mode':
+            continue
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+#writers start with BEGIN IMMEDIATE, taking the write lock up front: a deferred transaction
+#that reads first and writes later cannot wait for the lock and fails at once. writes
+#are serialized by sqlite itself, across threads and worker processes. the lock is held
+#until commit or rollback, so routes that stream a body or hash a password end the
+#transaction of their lookups first
+def use_sqlite_profile(engine, pragmas, readonly=False):
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas, readonly=readonly)
+        if not readonly:
+            dbapi_connection.isolation_level = None
+
+    if not readonly:
+        @event.listens_for(engine, 'begin')
+        def on_begin(connection):
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+def init_app(app):
+    database_path = sqlite_file_path(app, app.config['SQLALCHEMY_DATABASE_URI'])
+    #every view thread (ASGI_THREADS of them under asgi.py) can hold a connection of each
+    #pool; the default pool (5 + 10 overflow) would make the others time out
+    pool_size = app.config['ASGI_THREADS']
+    if database_path:
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {}).setdefault('pool_size', pool_size)
+    if database_path and app.config['SQLITE_READONLY_POOL']:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})['readonly'] = {
+            'url': readonly_sqlite_uri(database_path), 'pool_size': pool_size}
+    db.init_app(app)
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            if engine.dialect.name == 'sqlite':
+                use_sqlite_profile(engine, app.config['SQLITE_PRAGMAS'], readonly=bind_key == 'readonly')
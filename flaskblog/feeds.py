@@ -0,0 +1,153 @@
+from datetime import datetime
+from email.utils import format_datetime
+from flask import Blueprint, current_app, request, url_for
+from flask.cli import with_appcontext
+from markupsafe import escape
+import click
+import hashlib
+
+from .caches import feed_cache
+from .database import db
+from .httpcache import http_date
+from .models import FeedEntry, Post, Tag, User, post_tags
+from .pagination import post_detail_options
+
+bp = Blueprint('feeds', __name__)
+
+#___feed entries___
+#every post keeps its <entry> (atom) and <item> (rss) serialized in feed_entry, rebuilt
+#in the transaction that creates or edits it, so a feed is a header, at most FEED_SIZE
+#stored fragments and a footer. links in a fragment start with FEED_BASE, replaced by
+#the url root of the request serving the feed; escaped text can never contain a '<'
+FEED_SIZE = 20
+FEED_MAX_AGE = 300
+FEED_TITLE = 'Flaskblog Lite'
+FEED_BASE = '<feed-base/>'
+FEED_FORMATS = {'atom': 'application/atom+xml', 'rss': 'application/rss+xml'}
+
+def atom_date(value):
+    return http_date(value).isoformat().replace('+00:00', 'Z')
+
+def rss_date(value):
+    return format_datetime(http_date(value), usegmt=True)
+
+def render_atom_entry(post):
+    link = FEED_BASE + url_for('blog.view_post', post_id=post.id)
+    categories = ''.join(f'<category term="{escape(tag.tag_name)}"/>' for tag in post.tags)
+    return (f'<entry><title>{escape(post.title)}</title><link href="{link}"/><id>{link}</id>'
+            f'<published>{atom_date(post.creation_date)}</published>'
+            f'<updated>{atom_date(post.updated_at)}</updated>'
+            f'<author><name>{escape(post.author.username)}</name></author>{categories}'
+            f'<summary type="html">{escape(post.excerpt or "")}</summary></entry>')
+
+def render_rss_item(post):
+    link = FEED_BASE + url_for('blog.view_post', post_id=post.id)
+    categories = ''.join(f'<category>{escape(tag.tag_name)}</category>' for tag in post.tags)
+    return (f'<item><title>{escape(post.title)}</title><link>{link}</link>'
+            f'<guid isPermaLink="true">{link}</guid><pubDate>{rss_date(post.creation_date)}</pubDate>'
+            f'<dc:creator>{escape(post.author.username)}</dc:creator>{categories}'
+            f'<description>{escape(post.excerpt or "")}</description></item>')
+
+def store_feed_entry(post):
+    entry = db.session.get(FeedEntry, post.id) or FeedEntry(post_id=post.id)
+    entry.atom = render_atom_entry(post)
+    entry.rss = render_rss_item(post)
+    entry.built_at = datetime.now()
+    db.session.add(entry)
+
+def remove_feed_entry(post_id):
+    db.session.execute(FeedEntry.__table__.delete().where(FeedEntry.post_id == post_id))
+
+#fragments contain paths from url_for, so outside a request they are built in a fake one
+def rebuild_feed_entries():
+    db.session.execute(FeedEntry.__table__.delete())
+    count = 0
+    with current_app.test_request_context():
+        for post in Post.query.options(*post_detail_options()).order_by(Post.id).yield_per(500):
+            store_feed_entry(post)
+            count += 1
+    db.session.commit()
+    return count
+
+@click.command('rebuild-feeds')
+@with_appcontext
+def rebuild_feeds_command():
+    """Rebuild the stored Atom/RSS entries of every post."""
+    click.echo(f'Built feed entries for {rebuild_feed_entries()} posts.')
+
+def init_app(app):
+    app.cli.add_command(rebuild_feeds_command)
+
+#___feeds___
+#the ETag comes from one indexed query for the ids and dates of the newest entries, so
+#a poll that changed nothing gets its 304 without reading a fragment; assembled
+#feeds are cached by ETag
+def feed_header(fmt, title, page_url, updated):
+    title = escape(f'{FEED_TITLE} - {title}' if title else FEED_TITLE)
+    if fmt == 'atom':
+        return (f'<?xml version="1.0" encoding="utf-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">'
+                f'<title>{title}</title><id>{escape(request.base_url)}</id>'
+                f'<link rel="self" href="{escape(request.base_url)}"/><link href="{escape(page_url)}"/>'
+                f'<updated>{atom_date(updated)}</updated>')
+    return (f'<?xml version="1.0" encoding="utf-8"?>\n<rss version="2.0" '
+            f'xmlns:atom="http://www.w3.org/2005/Atom" xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+            f'<title>{title}</title><link>{escape(page_url)}</link><description>{title}</description>'
+            f'<atom:link rel="self" type="application/rss+xml" href="{escape(request.base_url)}"/>'
+            f'<lastBuildDate>{rss_date(updated)}</lastBuildDate>')
+
+FEED_FOOTERS = {'atom': '</feed>', 'rss': '</channel></rss>'}
+
+def build_feed(fmt, title, page_url, rows):
+    post_ids = [row.id for row in rows]
+    fragments = dict(db.session.query(FeedEntry.post_id, getattr(FeedEntry, fmt))
+                     .filter(FeedEntry.post_id.in_(post_ids)))
+    #posts written before the feed_entry table (or bulk inserted) until rebuild-feeds runs
+    missing = [post_id for post_id in post_ids if post_id not in fragments]
+    if missing:
+        render = render_atom_entry if fmt == 'atom' else render_rss_item
+        for post in Post.query.options(*post_detail_options()).filter(Post.id.in_(missing)):
+            fragments[post.id] = render(post)
+    updated = max((row.updated_at for row in rows), default=datetime.now())
+    body = feed_header(fmt, title, page_url, updated) \
+        + ''.join(fragments[post_id] for post_id in post_ids if post_id in fragments) + FEED_FOOTERS[fmt]
+    return body.replace(FEED_BASE, request.url_root.rstrip('/'))
+
+def feed_response(fmt, title, page_url, query):
+    rows = query.outerjoin(FeedEntry, FeedEntry.post_id == Post.id) \
+        .order_by(Post.creation_date.desc(), Post.id.desc()).limit(FEED_SIZE).all()
+    etag = hashlib.sha1(repr((fmt, request.url_root, page_url, title,
+                              [tuple(row) for row in rows])).encode()).hexdigest()
+    #no Last-Modified: a deleted entry leaves the newest updated_at where it was
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        body = feed_cache.get(etag)
+        if body is None:
+            body = build_feed(fmt, title, page_url, rows)
+            feed_cache.set(etag, body)
+        response = current_app.response_class(body, mimetype=FEED_FORMATS[fmt])
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = FEED_MAX_AGE
+    return response
+
+def feed_rows():
+    return db.session.query(Post.id, Post.updated_at, FeedEntry.built_at)
+
+@bp.route('/feed.<any(atom, rss):fmt>')
+def site_feed(fmt):
+    return feed_response(fmt, None, url_for('blog.index', _external=True), feed_rows())
+
+@bp.route('/tag/<string:tag_name>/feed.<any(atom, rss):fmt>')
+def tag_feed(tag_name, fmt):
+    tag = Tag.query.filter_by(tag_name=tag_name).first_or_404()
+    query = feed_rows().join(post_tags, post_tags.c.post_id == Post.id).filter(post_tags.c.tag_id == tag.id)
+    return feed_response(fmt, f'#{tag.tag_name}',
+                         url_for('blog.posts_by_tags', tag_name=tag.tag_name, _external=True), query)
+
+@bp.route('/user/<username>/feed.<any(atom, rss):fmt>')
+def author_feed(username, fmt):
+    user = User.query.filter_by(username=username).first_or_404()
+    return feed_response(fmt, user.username,
+                         url_for('users.user_profile', username=user.username, _external=True),
+                         feed_rows().filter(Post.user_id == user.id))
@@ -0,0 +1,39 @@
+from flask import session
+from flask_wtf import FlaskForm
+from wtforms import StringField, TextAreaField, IntegerField, SubmitField
+from wtforms.validators import DataRequired, Email, Length
+import random
+
+
+class ContactForm(FlaskForm):
+    name = StringField('Your Name', validators=[DataRequired(), Length(max=100)])
+    email = StringField('Your Email', validators=[DataRequired(), Email(), Length(max=120)])
+    subject = StringField('Subject', validators=[DataRequired(), Length(max=200)])
+    message = TextAreaField('Your Message', validators=[DataRequired(), Length(min=10, max=1000)])
+    
+    math_question = IntegerField('Math Question', validators=[DataRequired()]) 
+    
+    submit = SubmitField('Send Message')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        # Prova a recuperare i numeri e l'operazione dalla sessione
+        # Se non sono in sessione (prima volta che carichi la pagina), generane di nuovi
+        self.num1 = session.get('math_num1', random.randint(1, 10))
+        self.num2 = session.get('math_num2', random.randint(1, 10))
+        self.operation = session.get('math_operation', random.choice(['+', '-']))
+        
+        # --- avoid negative nums ---
+        if self.operation == '-':
+            if self.num1 < self.num2:
+                self.num1, self.num2 = self.num2, self.num1 # Scambia i valori
+            # --- end logic---
+        
+        if self.operation == '+':
+            self.correct_result = self.num1 + self.num2
+        else:
+            self.correct_result = self.num1 - self.num2
+        
+        # Aggiorna l'etichetta del campo della domanda matematica
+        self.math_question.label.text = f'What is {self.num1} {self.operation} {self.num2}?'
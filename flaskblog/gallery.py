@@ -0,0 +1,190 @@
+from datetime import datetime
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from werkzeug.exceptions import ClientDisconnected
+from werkzeug.utils import secure_filename
+import os
+import uuid
+
+from .database import db
+from .models import Upload, UploadSession
+from .uploads import (IMAGE_HEADER_SIZE, UPLOAD_CHUNK_SIZE, allowed_file, discard_upload_session,
+                      file_sha256, get_upload_session_or_404, process_upload_later,
+                      release_gallery_upload, save_picture, sniff_image_type, store_upload,
+                      thumbnail_size, thumbnail_url, upload_session_path, upload_session_status,
+                      upload_users)
+
+bp = Blueprint('gallery', __name__)
+
+#setting images per page in gallery
+IMAGES_PER_PAGE = 20
+
+@bp.route('/gallery', methods=['GET', 'POST'])
+@login_required
+def gallery():
+    if request.method == 'POST':
+        if 'image_file' not in request.files:
+            flash('No images selected', 'danger')
+            return redirect(url_for('gallery.gallery'))
+        
+        file = request.files['image_file']
+        if file.filename == '':
+            flash('No file selected', 'danger')
+            return redirect(url_for('gallery.gallery'))
+            
+        try:
+            upload = save_picture(file, uploader=current_user, gallery=True)
+            filename = upload.filename
+            db.session.commit()
+            process_upload_later(upload)
+            flash(f'Image {filename} successfully uploaded!', 'success')
+        except Exception as e:
+            flash(f'An unexpected error occurred during the upload {e}', 'danger')
+        return redirect(url_for('gallery.gallery'))
+    
+    page = request.args.get('page', 1, type=int)
+    uploads = Upload.query.order_by(Upload.created_at.desc(), Upload.id.desc()).paginate(
+        page=page, per_page=IMAGES_PER_PAGE, error_out=False)
+
+    image_files = []
+    for upload in uploads.items:
+        url = url_for('static', filename='uploads/' + upload.filename)
+        #width is set once the derivatives (thumbnail included) have been generated
+        processed = upload.width is not None
+        image_files.append({
+            'filename': upload.filename,
+            'url': url,
+            'thumbnail_url': thumbnail_url(upload.filename) if processed else url,
+            'thumbnail_size': thumbnail_size(upload.width, upload.height) if processed else None
+        })
+        
+    return render_template('gallery.html', image_files=image_files, title='File manager', page=page,
+                           total_pages=uploads.pages, total_images=uploads.total)
+
+#___chunked upload endpoints___
+@bp.route('/uploads', methods=['POST'])
+@login_required
+def create_upload_session():
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(str(data.get('filename', '')))
+    size = data.get('size')
+    if not filename or not allowed_file(filename):
+        return jsonify(error='File type not allowed.'), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify(error='Missing file size.'), 400
+    if size > current_app.config['UPLOAD_MAX_SIZE']:
+        return jsonify(error='File is too large.'), 413
+    upload_session = UploadSession(id=uuid.uuid4().hex, user_id=current_user.id, filename=filename, size=size)
+    open(upload_session_path(upload_session), 'wb').close()
+    db.session.add(upload_session)
+    db.session.commit()
+    status = upload_session_status(upload_session)
+    return jsonify(status), 201, {'Location': status['url'], 'Upload-Offset': '0'}
+
+@bp.route('/uploads/<session_id>', methods=['GET'])
+@login_required
+def upload_session_status_view(session_id):
+    upload_session = get_upload_session_or_404(session_id)
+    return jsonify(upload_session_status(upload_session)), 200, {'Upload-Offset': str(upload_session.offset)}
+
+@bp.route('/uploads/<session_id>', methods=['PATCH'])
+@login_required
+def upload_session_chunk(session_id):
+    upload_session = get_upload_session_or_404(session_id)
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset != upload_session.offset:
+        return jsonify(error='Offset mismatch.', offset=upload_session.offset), 409
+
+    size, filename = upload_session.size, upload_session.filename
+    part_path = upload_session_path(upload_session)
+    #the body can take minutes to arrive: end the lookup's transaction (and its write
+    #lock) before reading it
+    db.session.rollback()
+    received = offset
+    error = None
+    interrupted = False
+    with open(part_path, 'r+b') as part_file:
+        #anything past the recorded offset is a piece of an interrupted request
+        part_file.truncate(offset)
+        part_file.seek(offset)
+        try:
+            while True:
+                chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if received + len(chunk) > size:
+                    error = ('File is larger than announced.', 413)
+                    break
+                if received == 0 and sniff_image_type(chunk[:IMAGE_HEADER_SIZE]) is None:
+                    error = ('File is not a supported image.', 400)
+                    break
+                part_file.write(chunk)
+                received += len(chunk)
+        except ClientDisconnected:
+            interrupted = True
+
+    if error is not None:
+        discard_upload_session(upload_session)
+        db.session.commit()
+        return jsonify(error=error[0]), error[1]
+
+    #claim the range: a concurrent request for the same offset loses here
+    claimed = UploadSession.query.filter_by(id=upload_session.id, offset=offset) \
+        .update({'offset': received, 'updated_at': datetime.now()})
+    db.session.commit()
+    if not claimed:
+        db.session.refresh(upload_session)
+        return jsonify(error='Offset mismatch.', offset=upload_session.offset), 409
+    if interrupted:
+        return jsonify(error='Upload interrupted.', offset=received), 400
+
+    if received < size:
+        db.session.refresh(upload_session)
+        return jsonify(upload_session_status(upload_session)), 200, {'Upload-Offset': str(received)}
+
+    #hashed before store_upload looks the digest up, so outside a transaction
+    sha256 = file_sha256(part_path)
+    _, f_ext = os.path.splitext(filename)
+    upload = store_upload(part_path, sha256, f_ext.lower(), size, uploader=current_user, gallery=True)
+    discard_upload_session(upload_session)
+    db.session.commit()
+    process_upload_later(upload)
+    return jsonify(filename=upload.filename,
+                   url=url_for('static', filename='uploads/' + upload.filename)), 201
+
+@bp.route('/uploads/<session_id>', methods=['DELETE'])
+@login_required
+def cancel_upload_session(session_id):
+    discard_upload_session(get_upload_session_or_404(session_id))
+    db.session.commit()
+    return '', 204
+
+#____delete images____
+@bp.route('/gallery/delete/<string:filename>', methods=['POST'])
+@login_required
+def delete_uploaded_image(filename):
+    if not current_user.is_admin:
+        abort(403)
+    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    if os.path.exists(file_path) and allowed_file(filename):
+        posts, profiles = upload_users(filename)
+        if posts or profiles:
+            flash(f'File {filename} is used by {posts} posts and {profiles} profiles and was kept. '
+                  'Change their images first.', 'info')
+            return redirect(url_for('gallery.gallery'))
+        upload = Upload.query.filter_by(filename=filename).first()
+        if upload is None:
+            flash(f'File {filename} is not a tracked upload and was kept.', 'danger')
+            return redirect(url_for('gallery.gallery'))
+        try:
+            remaining = release_gallery_upload(upload)
+            db.session.commit()
+            if remaining:
+                flash(f'File {filename} is still used in {remaining} other places and was kept.', 'info')
+            else:
+                flash(f'File {filename} successfully removed!', 'success')
+        except Exception as e:
+            flash(f'An error occurred during the elimination of the file {e}', 'danger')
+    else:
+        flash(f'File {filename} not found or extension is not allowed.', 'danger')
+    return redirect(url_for('gallery.gallery'))
@@ -0,0 +1,75 @@
+from datetime import timezone
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+import glob
+import hashlib
+import os
+import re
+
+from .database import db
+from .models import Upload
+
+
+#pages get an ETag built from what they show (ids and updated_at of the posts, author
+#names, tag counts) plus the viewer, so it is known before rendering and a matching
+#If-None-Match gets a 304 without touching the template. pending flash messages
+#always get a full page. the salt changes whenever a template file changes. listings
+#pass no last_modified: deleting a post or retagging one changes the page without
+#moving any updated_at on it, so only the ETag can tell
+UPLOAD_CACHE_MAX_AGE = 365 * 24 * 3600
+
+def page_etag(*parts):
+    return hashlib.sha1(repr((current_app.config['ETAG_SALT'], current_user.get_id(), parts)).encode()).hexdigest()
+
+def listing_etag(posts, *parts):
+    return page_etag(*parts, [(post.id, post.updated_at, post.author.username) for post in posts],
+                     getattr(posts, 'has_next', None), getattr(posts, 'has_prev', None))
+
+def http_date(value):
+    #dates are stored as naive local time
+    return value.astimezone(timezone.utc).replace(microsecond=0) if value else None
+
+def conditional_response(etag, last_modified, render):
+    last_modified = http_date(last_modified)
+    not_modified = False
+    if '_flashes' not in session:
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        elif last_modified and request.if_modified_since:
+            not_modified = request.if_modified_since >= last_modified
+    response = current_app.response_class(status=304) if not_modified else make_response(render())
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
+
+#uploads are named after the digest of the uploaded bytes, but the original is rewritten
+#once (metadata stripped) by the processing job and the derivatives appear then. from
+#that point, recorded as the width of the upload row, the file behind a digest name
+#never changes and browsers may keep it forever. other files keep the default caching
+FINAL_UPLOAD = re.compile(r'uploads/(?:derived/)?([0-9a-f]{64})[.-]')
+
+def is_final_upload(path):
+    match = FINAL_UPLOAD.match(path)
+    if match is None:
+        return False
+    upload = db.session.query(Upload.width).filter_by(sha256=match.group(1)).first()
+    return upload is not None and upload.width is not None
+
+def cache_uploads_forever(response):
+    if request.endpoint == 'static' and response.status_code in (200, 304) \
+            and is_final_upload(request.view_args.get('filename', '')):
+        response.cache_control.public = True
+        response.cache_control.max_age = UPLOAD_CACHE_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
+def template_salt(app):
+    return str(max(os.path.getmtime(path) for path in glob.glob(os.path.join(app.root_path, 'templates', '*.html'))))
+
+def init_app(app):
+    app.config.setdefault('ETAG_SALT', template_salt(app))
+    app.after_request(cache_uploads_forever)
@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from flask.cli import AppGroup
+import click
+import json
+import threading
+
+from .database import db
+from .models import Job
+
+
+#jobs are rows in the job table and run on a small thread pool in the web process, so
+#requests only write the upload and return. a failed job is retried with exponential
+#backoff; `flask jobs drain` runs whatever is left (e.g. after a restart)
+JOB_WORKERS = 2
+JOB_RETRY_DELAY = 5
+
+JOB_HANDLERS = {}
+_job_executor = None
+_job_executor_lock = threading.Lock()
+
+def job_handler(kind):
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+def get_job_executor():
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is None:
+            _job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='jobs')
+        return _job_executor
+
+#commits the job row, then hands it to the pool
+def enqueue_job(kind, max_attempts=3, **payload):
+    job = Job(kind=kind, payload=json.dumps(payload), max_attempts=max_attempts)
+    db.session.add(job)
+    db.session.commit()
+    submit_job(job.id)
+    return job
+
+#the pool threads (and retry timers) have no app context of their own, so the app is
+#passed along and pushed around every run
+def submit_job(job_id, delay=0, app=None):
+    app = app or current_app._get_current_object()
+    if app.config['JOBS_RUN_INLINE']:
+        run_job(job_id)
+    elif delay:
+        timer = threading.Timer(delay, submit_job, args=(job_id,), kwargs={'app': app})
+        timer.daemon = True
+        timer.start()
+    else:
+        get_job_executor().submit(run_job_in_app_context, app, job_id)
+
+def run_job_in_app_context(app, job_id):
+    with app.app_context():
+        run_job(job_id)
+
+#the conditional update is the claim: only one worker moves a job out of 'queued'
+def run_job(job_id, force=False):
+    now = datetime.now()
+    claim = Job.__table__.update().where(Job.id == job_id, Job.status == 'queued')
+    if not force:
+        claim = claim.where(Job.run_after <= now)
+    claimed = db.session.execute(claim.values(
+        status='running', attempts=Job.attempts + 1, updated_at=now)).rowcount
+    db.session.commit()
+    if not claimed:
+        return False
+
+    #the handler (image processing) runs outside any transaction; it writes its results
+    #in short transactions of its own, and so is the outcome recorded here
+    kind, payload = db.session.query(Job.kind, Job.payload).filter_by(id=job_id).one()
+    db.session.commit()
+    try:
+        JOB_HANDLERS[kind](**json.loads(payload))
+        Job.query.filter_by(id=job_id).update({'status': 'done', 'last_error': None})
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.last_error = f'{type(e).__name__}: {e}'
+        if job.attempts < job.max_attempts:
+            delay = JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            job.status = 'queued'
+            job.run_after = datetime.now() + timedelta(seconds=delay)
+            db.session.commit()
+            if not force:
+                submit_job(job_id, delay=delay)
+        else:
+            job.status = 'failed'
+            db.session.commit()
+        current_app.logger.error(f'Job {job_id} ({job.kind}) failed: {e}')
+        return False
+
+jobs_cli = AppGroup('jobs', help='Inspect and run background jobs.')
+
+@jobs_cli.command('list')
+@click.option('--status', type=click.Choice(['queued', 'running', 'done', 'failed']))
+@click.option('--limit', default=20, show_default=True)
+def jobs_list_command(status, limit):
+    """Show queue counts and the most recent jobs."""
+    counts = db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all()
+    click.echo(', '.join(f'{name}: {count}' for name, count in counts) or 'Queue is empty.')
+    query = Job.query.order_by(Job.id.desc())
+    if status:
+        query = query.filter_by(status=status)
+    for job in query.limit(limit):
+        error = f' - {job.last_error}' if job.last_error else ''
+        click.echo(f'#{job.id} {job.kind} {job.status} attempts={job.attempts}/{job.max_attempts} '
+                   f'updated={job.updated_at:%Y-%m-%d %H:%M:%S} {job.payload}{error}')
+
+@jobs_cli.command('drain')
+@click.option('--retry-failed', is_flag=True, help='Queue failed jobs again before draining.')
+@click.option('--stale-minutes', default=30, show_default=True,
+              help='Jobs left running for longer than this are queued again.')
+def jobs_drain_command(retry_failed, stale_minutes):
+    """Run every queued job in this process, ignoring retry delays."""
+    stale = datetime.now() - timedelta(minutes=stale_minutes)
+    Job.query.filter(Job.status == 'running', Job.updated_at < stale).update({'status': 'queued'})
+    if retry_failed:
+        Job.query.filter_by(status='failed').update({'status': 'queued', 'attempts': 0})
+    db.session.commit()
+    done = failed = 0
+    for (job_id,) in db.session.query(Job.id).filter_by(status='queued').order_by(Job.id).all():
+        if run_job(job_id, force=True):
+            done += 1
+        else:
+            failed += 1
+    click.echo(f'{done} jobs done, {failed} failed.')
+
+def init_app(app):
+    app.cli.add_command(jobs_cli)
@@ -0,0 +1,119 @@
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import threading
+import time
+
+from .caches import CACHES
+
+
+#every request records its latency (histogram), the number and total time of its sql
+#statements, template render time and response size per endpoint. /admin/metrics
+#serves them in prometheus text format. requests slower than SLOW_REQUEST_MS (off when
+#None) are logged together with their statements, slowest first
+SLOW_REQUEST_MAX_QUERIES = 10
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class RequestMetrics:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, endpoint, seconds, sql_queries, sql_seconds, render_seconds, response_bytes):
+        with self._lock:
+            entry = self._endpoints.setdefault(endpoint, {
+                'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0, 'sql_queries': 0,
+                'sql_seconds': 0.0, 'render_seconds': 0.0, 'response_bytes': 0})
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry['buckets'][i] += 1
+            entry['count'] += 1
+            entry['sum'] += seconds
+            entry['sql_queries'] += sql_queries
+            entry['sql_seconds'] += sql_seconds
+            entry['render_seconds'] += render_seconds
+            entry['response_bytes'] += response_bytes
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(entry, buckets=list(entry['buckets']))
+                    for endpoint, entry in self._endpoints.items()}
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+request_metrics = RequestMetrics()
+
+PROMETHEUS_COUNTERS = (
+    ('sql_queries', 'flaskblog_sql_queries_total', 'SQL statements executed by requests.'),
+    ('sql_seconds', 'flaskblog_sql_seconds_total', 'Time spent in SQL statements.'),
+    ('render_seconds', 'flaskblog_template_render_seconds_total', 'Time spent rendering templates.'),
+    ('response_bytes', 'flaskblog_response_bytes_total', 'Size of the response bodies.'),
+)
+
+def prometheus_metrics():
+    snapshot = sorted(request_metrics.snapshot().items())
+    lines = ['# HELP flaskblog_request_duration_seconds Request latency.',
+             '# TYPE flaskblog_request_duration_seconds histogram']
+    for endpoint, entry in snapshot:
+        for bound, count in zip(request_metrics.buckets, entry['buckets']):
+            lines.append(f'flaskblog_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+        lines.append(f'flaskblog_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {entry["count"]}')
+        lines.append(f'flaskblog_request_duration_seconds_sum{{endpoint="{endpoint}"}} {entry["sum"]:.6f}')
+        lines.append(f'flaskblog_request_duration_seconds_count{{endpoint="{endpoint}"}} {entry["count"]}')
+    for key, name, help_text in PROMETHEUS_COUNTERS:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        lines += [f'{name}{{endpoint="{endpoint}"}} {entry[key]:g}' for endpoint, entry in snapshot]
+    for key in ('hits', 'misses', 'evictions'):
+        lines += [f'# HELP flaskblog_cache_{key}_total In-process cache {key}.', f'# TYPE flaskblog_cache_{key}_total counter']
+        lines += [f'flaskblog_cache_{key}_total{{cache="{name}"}} {cache.stats()[key]}' for name, cache in CACHES.items()]
+    return '\n'.join(lines) + '\n'
+
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.sql_statements = []
+    g.render_seconds = 0.0
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_sql_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['statement_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_sql_time(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('statement_started', None)
+    if started is not None and has_request_context() and 'sql_statements' in g:
+        g.sql_statements.append((statement, time.perf_counter() - started))
+
+def start_render_timer(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+def record_render_time(sender, template, context, **extra):
+    if 'render_started' in g:
+        g.render_seconds += time.perf_counter() - g.pop('render_started')
+
+def record_request_metrics(response):
+    if 'request_started' not in g:
+        return response
+    seconds = time.perf_counter() - g.request_started
+    statements = g.sql_statements
+    endpoint = request.endpoint or 'unmatched'
+    request_metrics.observe(endpoint, seconds, len(statements), sum(duration for _, duration in statements),
+                            g.render_seconds, response.content_length or 0)
+    slow_ms = current_app.config['SLOW_REQUEST_MS']
+    if slow_ms is not None and seconds * 1000 >= slow_ms:
+        slowest = sorted(statements, key=lambda item: item[1], reverse=True)[:SLOW_REQUEST_MAX_QUERIES]
+        current_app.logger.warning(
+            'Slow request %s %s (%s): %.1f ms, %d statements, %.1f ms sql, %.1f ms render%s',
+            request.method, request.full_path.rstrip('?'), endpoint, seconds * 1000, len(statements),
+            sum(duration for _, duration in statements) * 1000, g.render_seconds * 1000,
+            ''.join(f'\n  {duration * 1000:.1f} ms  {" ".join(statement.split())}' for statement, duration in slowest))
+    return response
+
+def init_app(app):
+    app.config.setdefault('SLOW_REQUEST_MS', None)
+    app.before_request(start_request_metrics)
+    app.after_request(record_request_metrics)
+    before_render_template.connect(start_render_timer, app)
+    template_rendered.connect(record_render_time, app)
@@ -0,0 +1,193 @@
+from datetime import datetime
+from flask_login import UserMixin
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from .database import db
+
+
+#tags table 
+post_tags = db.Table('post_tags',
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    #the primary key serves post -> tags; tag listings go the other way
+    db.Index('ix_post_tags_tag_id_post_id', 'tag_id', 'post_id')
+)
+
+#Post model
+class Post(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    creation_date = db.Column(db.DateTime, default=datetime.now())
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    image_file = db.Column(db.String(100), nullable=True, default=None)
+    image_width = db.Column(db.Integer, nullable=True)
+    image_height = db.Column(db.Integer, nullable=True)
+    excerpt = db.Column(db.Text, nullable=True)
+    summary = db.Column(db.String(300), nullable=True)
+    tags = db.relationship('Tag', secondary=post_tags, backref=db.backref('posts', lazy='dynamic'))
+
+    #listings are ordered by (creation_date, id), site-wide or for one author; sitemap
+    #shards read (id, updated_at) for whole id ranges
+    __table_args__ = (db.Index('ix_post_creation_date_id', 'creation_date', 'id'),
+                      db.Index('ix_post_user_id_creation_date', 'user_id', 'creation_date'),
+                      db.Index('ix_post_id_updated_at', 'id', 'updated_at'))
+    
+    def __repr__(self):
+        return f"<Text: {self.id}, title: {self.title}>"
+
+#atom/rss serializations of a post, see feeds.py
+class FeedEntry(db.Model):
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), primary_key=True)
+    atom = db.Column(db.Text, nullable=False)
+    rss = db.Column(db.Text, nullable=False)
+    built_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<FeedEntry: {self.post_id} built {self.built_at}>"
+
+#tag model
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    tag_name = db.Column(db.String(28), nullable=False, unique=True)
+    
+    def __repr__(self):
+        return f"<Tag: {self.id} named {self.tag_name}>"
+
+#per-tag counters kept up to date by set_post_tags, so listings never aggregate post_tags
+class TagStat(db.Model):
+    tag_id = db.Column(db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True)
+    post_count = db.Column(db.Integer, nullable=False, default=0)
+    last_used = db.Column(db.DateTime, nullable=True)
+    tag = db.relationship('Tag', backref=db.backref('stat', uselist=False, cascade='all, delete-orphan'))
+
+    __table_args__ = (db.Index('ix_tag_stat_post_count_last_used', 'post_count', 'last_used'),)
+
+    def __repr__(self):
+        return f"<TagStat: {self.tag_id} {self.post_count} posts>"
+
+
+#comment model
+class Comment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    author = db.Column(db.String(20), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    creation_date = db.Column(db.DateTime, default=datetime.now())
+    
+    def __repr__(self):
+        return f"<Comment id: {self.id} from {self.author}>"
+    
+
+#user model
+class User(db.Model, UserMixin):
+    id = db.Column(db.Integer, primary_key=True)
+    is_admin = db.Column(db.Boolean, default=False)
+    is_banned = db.Column(db.Boolean, default=False, nullable=False)
+    username = db.Column(db.String(28), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(128), nullable=False)
+    profile_picture = db.Column(db.String(100), nullable=False, default='default.png')
+    role = db.Column(db.String(20), default="contributor", nullable=False)
+    bio = db.Column(db.Text, nullable=True)
+    link = db.Column(db.String(255), nullable=True)
+    #copied from the post table when posts are created or deleted, see users.py
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_post_at = db.Column(db.DateTime, nullable=True)
+    post = db.relationship('Post', backref='author', lazy='dynamic')
+
+    __table_args__ = (db.Index('ix_user_post_count', 'post_count'),)
+    
+    @property
+    def is_active(self):
+        return True
+    
+    @property
+    def is_authenticated(self):
+        return True
+    
+    @property
+    def is_anonymous(self):
+        return False
+    
+    def set_password(self, password):
+        self.password_hash = generate_password_hash(password)
+        
+    def check_password(self, password):
+        return check_password_hash(self.password_hash, password)
+    
+    def __repr__(self):
+        return f'<User: {self.username} email: {self.email}'
+
+
+#contact
+class ContactMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    is_read = db.Column(db.Boolean, nullable=False, default=False)
+
+    #the inbox pages through one status at a time, newest first; the rowid (id) that
+    #sqlite appends to every index entry is the keyset tie-breaker
+    __table_args__ = (db.Index('ix_contact_message_is_read_timestamp', 'is_read', 'timestamp'),
+                      db.Index('ix_contact_message_timestamp', 'timestamp'))
+    
+    def __repr__(self):
+        return f"ContactMessage('{self.name}, {self.subject}, {self.timestamp})"
+
+#uploaded image, one row per file in UPLOAD_FOLDER. identical uploads share a row:
+#ref_count is the number of posts, profiles and gallery uploads pointing at the file,
+#gallery_count the part of it that comes from gallery uploads
+class Upload(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(100), nullable=False, unique=True)
+    sha256 = db.Column(db.String(64), nullable=True, index=True)
+    ref_count = db.Column(db.Integer, nullable=False, default=1)
+    gallery_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    size = db.Column(db.Integer, nullable=False)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    uploader = db.relationship('User', backref=db.backref('uploads', lazy='dynamic'))
+    post = db.relationship('Post', backref=db.backref('uploads', lazy='dynamic'))
+
+    __table_args__ = (db.Index('ix_upload_created_at_id', 'created_at', 'id'),)
+
+    def __repr__(self):
+        return f"<Upload: {self.id} {self.filename}>"
+
+#chunked upload in progress, the bytes received so far are in UPLOAD_FOLDER/.<id>.part
+class UploadSession(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    offset = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f"<UploadSession: {self.id} {self.filename} {self.offset}/{self.size}>"
+
+#background job, queued and run by jobs.py (see Background Jobs in the README)
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    last_error = db.Column(db.Text, nullable=True)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (db.Index('ix_job_status_run_after', 'status', 'run_after'),)
+
+    def __repr__(self):
+        return f"<Job: {self.id} {self.kind} ({self.status})>"
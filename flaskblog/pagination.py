@@ -0,0 +1,108 @@
+from datetime import datetime
+from flask import request
+from sqlalchemy import tuple_
+from sqlalchemy.orm import defer, joinedload, selectinload
+import base64
+
+from .caches import count_cache
+from .models import Post
+
+#setting posts per page in listings and search results
+POSTS_PER_PAGE = 5
+
+#pages are addressed by opaque after/before tokens encoding the (sort value, id) of
+#the last/first row shown, so deep pages cost the same as the first one. the bound is a
+#row value comparison, which sqlite turns into a range on an index ending in
+#(sort column, id); the equivalent OR of two conditions is only applied as a filter
+
+def encode_cursor(sort_value, row_id):
+    raw = f'{sort_value.isoformat()}|{row_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        sort_value, row_id = raw.split('|')
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+#count(*) is only run when a template asks for .total, and is cached per count_key
+def cached_count(count_key, query):
+    total = count_cache.get(count_key)
+    if total is None:
+        total = query.order_by(None).count()
+        count_cache.set(count_key, total)
+    return total
+
+class KeysetPagination:
+    def __init__(self, query, sort_column, id_column, after=None, before=None,
+                 per_page=POSTS_PER_PAGE, count_key=None, total=None):
+        self._query = query
+        self._count_key = count_key
+        self._total = total
+        self.per_page = per_page
+        after_key = decode_cursor(after)
+        before_key = decode_cursor(before) if after_key is None else None
+
+        if before_key is not None:
+            sort_value, row_id = before_key
+            rows = query.filter(tuple_(sort_column, id_column) > tuple_(sort_value, row_id)).order_by(sort_column.asc(), id_column.asc()).limit(per_page + 1).all()
+            self.has_prev = len(rows) > per_page
+            self.has_next = True
+            rows = rows[:per_page]
+            rows.reverse()
+        else:
+            if after_key is not None:
+                sort_value, row_id = after_key
+                query = query.filter(tuple_(sort_column, id_column) < tuple_(sort_value, row_id))
+            rows = query.order_by(sort_column.desc(), id_column.desc()).limit(per_page + 1).all()
+            self.has_next = len(rows) > per_page
+            self.has_prev = after_key is not None
+            rows = rows[:per_page]
+
+        self.items = rows
+        self._sort_key = sort_column.key
+        self._id_key = id_column.key
+        if not rows:
+            self.has_next = self.has_prev = False
+
+    def _cursor_for(self, row):
+        return encode_cursor(getattr(row, self._sort_key), getattr(row, self._id_key))
+
+    @property
+    def next_cursor(self):
+        return self._cursor_for(self.items[-1]) if self.has_next else None
+
+    @property
+    def prev_cursor(self):
+        return self._cursor_for(self.items[0]) if self.has_prev else None
+
+    @property
+    def total(self):
+        if self._total is not None:
+            return self._total
+        if self._count_key is None:
+            return self._query.order_by(None).count()
+        return cached_count(self._count_key, self._query)
+
+    def __iter__(self):
+        return iter(self.items)
+
+#listing templates show author and tags for every row: load them in two batched
+#queries instead of two lazy loads per post. content is never needed there (templates
+#use the stored excerpt), so it is not read at all
+def post_listing_options():
+    return (joinedload(Post.author), selectinload(Post.tags), defer(Post.content))
+
+def post_detail_options():
+    return (joinedload(Post.author), selectinload(Post.tags))
+
+def paginate_posts(query, count_key=None, total=None):
+    return KeysetPagination(
+        query.options(*post_listing_options()), Post.creation_date, Post.id,
+        after=request.args.get('after'), before=request.args.get('before'),
+        per_page=POSTS_PER_PAGE, count_key=count_key, total=total
+    )
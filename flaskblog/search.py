@@ -0,0 +1,88 @@
+from flask.cli import with_appcontext
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import text
+import click
+import re
+
+from .content import html_to_text
+from .database import db
+from .models import Post
+from .pagination import POSTS_PER_PAGE, post_listing_options
+
+
+#post_fts is created by a migration, rowid is the post id
+SEARCH_TITLE_WEIGHT = 10.0
+SEARCH_CONTENT_WEIGHT = 1.0
+
+def create_search_index():
+    db.session.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts "
+        "USING fts5(title, content, tokenize='unicode61 remove_diacritics 2')"
+    ))
+
+def index_post_for_search(post):
+    remove_post_from_search(post.id)
+    db.session.execute(
+        text('INSERT INTO post_fts(rowid, title, content) VALUES (:id, :title, :content)'),
+        {'id': post.id, 'title': post.title, 'content': html_to_text(post.content)}
+    )
+
+def remove_post_from_search(post_id):
+    db.session.execute(text('DELETE FROM post_fts WHERE rowid = :id'), {'id': post_id})
+
+def rebuild_search_index():
+    db.session.execute(text('DELETE FROM post_fts'))
+    count = 0
+    for post in Post.query.order_by(Post.id).yield_per(500):
+        index_post_for_search(post)
+        count += 1
+    db.session.commit()
+    return count
+
+#turn user input into a safe fts5 query: every word is quoted, the last one is a prefix
+def build_match_query(search_query):
+    words = re.findall(r'\w+', search_query or '')
+    if not words:
+        return None
+    terms = ['"%s"' % word for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+class SearchPagination(Pagination):
+    def _query_items(self):
+        match = self._query_args['match']
+        if match is None:
+            return []
+        post_ids = db.session.execute(
+            text('SELECT rowid FROM post_fts WHERE post_fts MATCH :match '
+                 'ORDER BY bm25(post_fts, :title_weight, :content_weight) '
+                 'LIMIT :limit OFFSET :offset'),
+            {'match': match, 'title_weight': SEARCH_TITLE_WEIGHT,
+             'content_weight': SEARCH_CONTENT_WEIGHT,
+             'limit': self.per_page, 'offset': self._query_offset}
+        ).scalars().all()
+        posts_by_id = {post.id: post for post in Post.query.options(*post_listing_options()).filter(Post.id.in_(post_ids))}
+        return [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+
+    def _query_count(self):
+        match = self._query_args['match']
+        if match is None:
+            return 0
+        return db.session.execute(
+            text('SELECT count(*) FROM post_fts WHERE post_fts MATCH :match'),
+            {'match': match}
+        ).scalar()
+
+def search_posts(search_query, page, per_page=POSTS_PER_PAGE):
+    return SearchPagination(page=page, per_page=per_page, match=build_match_query(search_query))
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Rebuild the full-text search index from the post table."""
+    create_search_index()
+    count = rebuild_search_index()
+    click.echo(f'Indexed {count} posts.')
+
+def init_app(app):
+    app.cli.add_command(rebuild_search_index_command)
@@ -0,0 +1,143 @@
+from flask import Blueprint, abort, current_app, request, send_file, stream_with_context, url_for
+from markupsafe import escape
+import glob
+import hashlib
+import os
+import tempfile
+
+from .caches import sitemap_cache
+from .database import db
+from .httpcache import http_date
+from .models import Post, Tag, TagStat, User
+
+bp = Blueprint('sitemaps', __name__)
+
+#___sitemaps___
+#/sitemap.xml lists shards of SITEMAP_SHARD_SIZE ids per kind (posts, tag pages, author
+#profiles). a shard is streamed from the database once and written to SITEMAP_FOLDER
+#while it is sent; the file name carries the site it was built for (the urls in it are
+#absolute, and the app can be served under several hostnames) and a signature of its
+#id range (row count and newest lastmod, read from an index), so a range that changed
+#gets a new file and the others keep being served from disk
+SITEMAP_SHARD_SIZE = 5000
+SITEMAP_BATCH = 500
+SITEMAP_MAX_AGE = 3600
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+#per kind: the id column shards are cut on, the column the url is built from, the
+#lastmod column and the rows that get a url
+def sitemap_source(kind):
+    if kind == 'posts':
+        return Post.id, Post.id, Post.updated_at, db.session.query(Post)
+    if kind == 'tags':
+        return Tag.id, Tag.tag_name, TagStat.last_used, db.session.query(Tag).outerjoin(TagStat)
+    return User.id, User.username, User.last_post_at, db.session.query(User).filter(User.post_count > 0)
+
+def sitemap_url(kind, key):
+    if kind == 'posts':
+        return url_for('blog.view_post', post_id=key, _external=True)
+    if kind == 'tags':
+        return url_for('blog.posts_by_tags', tag_name=key, _external=True)
+    return url_for('users.user_profile', username=key, _external=True)
+
+SITEMAP_KINDS = ('posts', 'tags', 'users')
+
+def sitemap_lastmod(value):
+    return f'<lastmod>{http_date(value).isoformat()}</lastmod>' if value else ''
+
+def shard_signature(kind, shard):
+    id_column, _, lastmod_column, query = sitemap_source(kind)
+    start = shard * SITEMAP_SHARD_SIZE
+    count, lastmod = query.with_entities(db.func.count(id_column), db.func.max(lastmod_column)) \
+        .filter(id_column >= start, id_column < start + SITEMAP_SHARD_SIZE).one()
+    if not count:
+        return None
+    return hashlib.sha1(repr((kind, shard, count, lastmod)).encode()).hexdigest()[:16]
+
+def site_key():
+    return hashlib.sha1(request.url_root.encode()).hexdigest()[:8]
+
+def shard_chunks(kind, shard):
+    id_column, key_column, lastmod_column, query = sitemap_source(kind)
+    start = shard * SITEMAP_SHARD_SIZE
+    rows = query.with_entities(key_column, lastmod_column) \
+        .filter(id_column >= start, id_column < start + SITEMAP_SHARD_SIZE) \
+        .order_by(id_column).yield_per(SITEMAP_BATCH)
+    batch = [f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">']
+    for key, lastmod in rows:
+        batch.append(f'<url><loc>{escape(sitemap_url(kind, key))}</loc>{sitemap_lastmod(lastmod)}</url>')
+        if len(batch) >= SITEMAP_BATCH:
+            yield ''.join(batch)
+            batch = []
+    batch.append('</urlset>')
+    yield ''.join(batch)
+
+#sends the chunks on and writes them to a temporary file that replaces the cached
+#shard once complete; a client that disconnects halfway leaves nothing behind
+def write_through(path, chunks):
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    #older versions of this shard for the same site
+    prefix = path.rsplit('-', 1)[0]
+    for stale in glob.glob(f'{glob.escape(prefix)}-*.xml'):
+        if stale != path:
+            os.remove(stale)
+
+@bp.route('/sitemaps/<any(posts, tags, users):kind>-<int:shard>.xml')
+def sitemap_shard(kind, shard):
+    signature = shard_signature(kind, shard)
+    if signature is None:
+        abort(404)
+    site = site_key()
+    path = os.path.join(current_app.config['SITEMAP_FOLDER'], f'{kind}-{shard}-{site}-{signature}.xml')
+    if os.path.exists(path):
+        response = send_file(path, mimetype='application/xml', etag=f'{site}-{signature}', conditional=True,
+                             max_age=SITEMAP_MAX_AGE)
+    else:
+        response = current_app.response_class(
+            stream_with_context(write_through(path, shard_chunks(kind, shard))), mimetype='application/xml')
+        response.set_etag(f'{site}-{signature}')
+        response.cache_control.public = True
+        response.cache_control.max_age = SITEMAP_MAX_AGE
+    return response
+
+#the index reads every id once per kind (the post one from a covering index), so it is
+#kept in memory for the cache ttl
+def build_sitemap_index():
+    entries = []
+    for kind in SITEMAP_KINDS:
+        id_column, _, lastmod_column, query = sitemap_source(kind)
+        shard_column = id_column // SITEMAP_SHARD_SIZE
+        for shard, lastmod in query.with_entities(shard_column, db.func.max(lastmod_column)) \
+                .group_by(shard_column).order_by(shard_column):
+            loc = url_for('sitemaps.sitemap_shard', kind=kind, shard=shard, _external=True)
+            entries.append(f'<sitemap><loc>{escape(loc)}</loc>{sitemap_lastmod(lastmod)}</sitemap>')
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">'
+            + ''.join(entries) + '</sitemapindex>')
+
+@bp.route('/sitemap.xml')
+def sitemap_index():
+    cached = sitemap_cache.get(request.url_root)
+    if cached is None:
+        body = build_sitemap_index()
+        cached = (body, hashlib.sha1(body.encode()).hexdigest())
+        sitemap_cache.set(request.url_root, cached)
+    body, etag = cached
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype='application/xml')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = SITEMAP_MAX_AGE
+    return response
@@ -0,0 +1,113 @@
+from datetime import datetime
+from flask.cli import with_appcontext
+from sqlalchemy import exists, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import click
+
+from .database import db
+from .models import Post, Tag, TagStat, post_tags
+
+
+#tags are resolved for a whole post at once: one IN query for the names, one upsert
+#for the missing ones (a concurrent post may create the same tag, ON CONFLICT skips it)
+#and one more IN query to pick up the ids of the new rows
+def parse_tags(tags_string):
+    return list(dict.fromkeys(tag.strip().lower() for tag in tags_string.split(',') if tag.strip()))
+
+def resolve_tags(tag_names):
+    if not tag_names:
+        return []
+    tags = {tag.tag_name: tag for tag in Tag.query.filter(Tag.tag_name.in_(tag_names))}
+    missing = [name for name in tag_names if name not in tags]
+    if missing:
+        db.session.execute(sqlite_insert(Tag).values([{'tag_name': name} for name in missing])
+                           .on_conflict_do_nothing(index_elements=['tag_name']))
+        tags.update((tag.tag_name, tag) for tag in Tag.query.filter(Tag.tag_name.in_(missing)))
+    return [tags[name] for name in tag_names]
+
+#writes only the association rows that change; returns the added and removed tag ids
+def set_post_tags(post, tags):
+    wanted = {tag.id for tag in tags}
+    current = set(db.session.scalars(select(post_tags.c.tag_id).where(post_tags.c.post_id == post.id)))
+    added, removed = wanted - current, current - wanted
+    if removed:
+        db.session.execute(post_tags.delete().where(post_tags.c.post_id == post.id,
+                                                    post_tags.c.tag_id.in_(removed)))
+    if added:
+        db.session.execute(post_tags.insert(), [{'post_id': post.id, 'tag_id': tag_id} for tag_id in added])
+    db.session.expire(post, ['tags'])
+    update_tag_stats(added, removed)
+    return added, removed
+
+def update_tag_stats(added, removed):
+    if added:
+        insert = sqlite_insert(TagStat).values(
+            [{'tag_id': tag_id, 'post_count': 1, 'last_used': datetime.now()} for tag_id in added])
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=['tag_id'],
+            set_={'post_count': TagStat.post_count + 1, 'last_used': insert.excluded.last_used}))
+    if removed:
+        TagStat.query.filter(TagStat.tag_id.in_(removed)).update(
+            {'post_count': TagStat.post_count - 1}, synchronize_session=False)
+
+#tags left without posts are removed in the transaction that orphaned them: one DELETE
+#limited to the candidate ids, plus the matching stats rows (sqlite does not enforce the
+#ON DELETE CASCADE unless foreign keys are switched on). without ids it sweeps every orphan
+def delete_orphan_tags(tag_ids=None):
+    if tag_ids is not None and not tag_ids:
+        return 0
+    orphaned = select(Tag.id).where(~exists().where(post_tags.c.tag_id == Tag.id))
+    if tag_ids is not None:
+        orphaned = orphaned.where(Tag.id.in_(tag_ids))
+    db.session.execute(TagStat.__table__.delete().where(TagStat.tag_id.in_(orphaned)))
+    return db.session.execute(Tag.__table__.delete().where(Tag.id.in_(orphaned))).rowcount
+
+@click.command('sweep-orphan-tags')
+@with_appcontext
+def sweep_orphan_tags_command():
+    """Delete tags that are no longer attached to any post."""
+    removed = delete_orphan_tags()
+    db.session.commit()
+    click.echo(f'Removed {removed} orphan tags.')
+
+TAG_CLOUD_SIZE = 10
+
+def top_tags(limit=TAG_CLOUD_SIZE):
+    return db.session.query(Tag.tag_name, TagStat.post_count).join(TagStat) \
+        .filter(TagStat.post_count > 0) \
+        .order_by(TagStat.post_count.desc(), TagStat.last_used.desc()).limit(limit).all()
+
+#recomputes the counters from post_tags; last_used only moves forward, to the newest
+#tagged post, since the time a tag was attached to an older post is not recorded anywhere
+def repair_tag_stats():
+    actual = {tag_id: (count, newest) for tag_id, count, newest in db.session.query(
+        post_tags.c.tag_id, db.func.count(), db.func.max(Post.creation_date))
+        .join(Post, Post.id == post_tags.c.post_id).group_by(post_tags.c.tag_id)}
+    stats = {stat.tag_id: stat for stat in TagStat.query}
+    fixed = 0
+    for (tag_id,) in db.session.query(Tag.id):
+        count, newest = actual.get(tag_id, (0, None))
+        stat = stats.get(tag_id)
+        if stat is None:
+            db.session.add(TagStat(tag_id=tag_id, post_count=count, last_used=newest))
+            fixed += 1
+            continue
+        changed = stat.post_count != count
+        stat.post_count = count
+        if newest is not None and (stat.last_used is None or stat.last_used < newest):
+            stat.last_used = newest
+            changed = True
+        fixed += changed
+    fixed += TagStat.query.filter(TagStat.tag_id.not_in(select(Tag.id))).delete(synchronize_session=False)
+    db.session.commit()
+    return fixed
+
+@click.command('repair-tag-stats')
+@with_appcontext
+def repair_tag_stats_command():
+    """Recompute tag post counts from the post_tags table."""
+    click.echo(f'Fixed {repair_tag_stats()} tag statistics.')
+
+def init_app(app):
+    app.cli.add_command(sweep_orphan_tags_command)
+    app.cli.add_command(repair_tag_stats_command)
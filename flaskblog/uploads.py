@@ -0,0 +1,355 @@
+from datetime import datetime, timedelta
+from flask import abort, current_app, url_for
+from flask.cli import with_appcontext
+from flask_login import current_user
+from sqlalchemy import delete, event, update
+import click
+import glob
+import hashlib
+import os
+import uuid
+
+from .caches import invalidate_post_page
+from .database import db
+from .jobs import enqueue_job, job_handler
+from .models import Post, Upload, UploadSession, User
+
+
+#import img logic
+#1) check file extention
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+#2) check the content: the first bytes of the file must be a supported image signature
+IMAGE_HEADER_SIZE = 12
+
+def sniff_image_type(header):
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+#save the load image; the Upload row is added to the session, the caller commits.
+#files are hashed while they are written and stored under the digest of the uploaded
+#bytes, so an image uploaded again reuses the existing file
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+def save_picture(form_picture, uploader=None, gallery=False):
+    if not allowed_file(form_picture.filename):
+        raise ValueError('File type not allowed.')
+    _, f_ext = os.path.splitext(form_picture.filename)
+    chunk = form_picture.stream.read(UPLOAD_CHUNK_SIZE)
+    if sniff_image_type(chunk[:IMAGE_HEADER_SIZE]) is None:
+        raise ValueError('File is not a supported image.')
+    tmp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f'.{uuid.uuid4()}.part')
+    digest = hashlib.sha256()
+    size = 0
+    with open(tmp_path, 'wb') as tmp_file:
+        while chunk:
+            digest.update(chunk)
+            tmp_file.write(chunk)
+            size += len(chunk)
+            chunk = form_picture.stream.read(UPLOAD_CHUNK_SIZE)
+    return store_upload(tmp_path, digest.hexdigest(), f_ext.lower(), size, uploader, gallery=gallery)
+
+#counts are changed in the database (UPDATE ... RETURNING), never from a value read
+#earlier, so concurrent requests sharing a file cannot lose a reference
+def add_upload_references(upload_id, refs=1, gallery_refs=0):
+    return db.session.execute(
+        update(Upload).where(Upload.id == upload_id)
+        .values(ref_count=Upload.ref_count + refs, gallery_count=Upload.gallery_count + gallery_refs)
+        .returning(Upload.ref_count)).scalar_one()
+
+#a new file is moved into UPLOAD_FOLDER once the row is committed, and removed if it never is
+def store_upload(tmp_path, sha256, ext, size, uploader=None, gallery=False):
+    upload = Upload.query.filter_by(sha256=sha256).first()
+    if upload is not None:
+        os.remove(tmp_path)
+        add_upload_references(upload.id, 1, int(gallery))
+        return upload
+    picture_fn = sha256 + ext
+    #under a name of its own: the caller may remove tmp_path (a chunked session's part file)
+    pending_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f'.{uuid.uuid4()}.part')
+    os.replace(tmp_path, pending_path)
+    upload = Upload(filename=picture_fn, sha256=sha256, ref_count=1, gallery_count=int(gallery),
+                    size=size, user_id=uploader.id if uploader else None)
+    db.session.add(upload)
+    db.session.info.setdefault('stored_files', []).append(
+        (pending_path, os.path.join(current_app.config['UPLOAD_FOLDER'], picture_fn)))
+    return upload
+
+#the row goes when no reference is left, and the files once that is committed
+def remove_unreferenced_upload(upload_id, filename):
+    db.session.execute(delete(Upload).where(Upload.id == upload_id, Upload.ref_count <= 0))
+    db.session.info.setdefault('released_files', []).append(filename)
+
+#drops one reference; returns how many are left
+def release_upload(filename):
+    upload_id = db.session.query(Upload.id).filter_by(filename=filename).scalar()
+    if upload_id is None:
+        return 0
+    remaining = add_upload_references(upload_id, -1)
+    if remaining > 0:
+        return remaining
+    remove_unreferenced_upload(upload_id, filename)
+    return 0
+
+#posts and profiles showing the file; the gallery cannot delete it while there are any
+def upload_users(filename):
+    posts = Post.query.filter_by(image_file=filename).count()
+    profiles = User.query.filter_by(profile_picture=f'uploads/{filename}').count()
+    return posts, profiles
+
+#drops the gallery's own references, and the file with them if nothing else holds one
+def release_gallery_upload(upload):
+    remaining = db.session.execute(
+        update(Upload).where(Upload.id == upload.id)
+        .values(ref_count=Upload.ref_count - Upload.gallery_count, gallery_count=0)
+        .returning(Upload.ref_count)).scalar_one()
+    if remaining > 0:
+        return remaining
+    remove_unreferenced_upload(upload.id, upload.filename)
+    return 0
+
+@event.listens_for(db.session, 'after_commit')
+def remove_released_files(session):
+    for tmp_path, path in session.info.pop('stored_files', []):
+        os.replace(tmp_path, path)
+    for filename in session.info.pop('released_files', []):
+        remove_upload_files(filename)
+
+#stored files whose transaction did not commit (rolled back, or closed at teardown)
+@event.listens_for(db.session, 'after_transaction_end')
+def remove_uncommitted_files(session, transaction):
+    if transaction.parent is None:
+        for tmp_path, _ in session.info.pop('stored_files', []):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_released_files(session):
+    session.info.pop('released_files', None)
+
+#files uploaded before content addressing can still be byte-identical: keep the oldest
+#copy, point every reference at it and remove the others
+@click.command('dedupe-uploads')
+@with_appcontext
+def dedupe_uploads_command():
+    """Merge uploads with identical content into a single file."""
+    duplicated = db.session.query(Upload.sha256).filter(Upload.sha256.isnot(None)) \
+        .group_by(Upload.sha256).having(db.func.count(Upload.id) > 1).all()
+    merged = 0
+    for (sha256,) in duplicated:
+        keep, *extras = Upload.query.filter_by(sha256=sha256).order_by(Upload.created_at, Upload.id).all()
+        for extra in extras:
+            old_path, new_path = f'uploads/{extra.filename}', f'uploads/{keep.filename}'
+            Post.query.filter_by(image_file=extra.filename).update({'image_file': keep.filename})
+            User.query.filter_by(profile_picture=old_path).update({'profile_picture': new_path})
+            for column in (Post.content, Post.excerpt):
+                Post.query.filter(column.contains(old_path)).update(
+                    {column: db.func.replace(column, old_path, new_path)}, synchronize_session=False)
+            add_upload_references(keep.id, extra.ref_count, extra.gallery_count)
+            db.session.delete(extra)
+            db.session.info.setdefault('released_files', []).append(extra.filename)
+            merged += 1
+    db.session.commit()
+    click.echo(f'Merged {merged} duplicate uploads.')
+
+#new files still need their derivatives; a reused one may already have them
+def process_upload_later(upload, post_id=None):
+    if upload.width is None:
+        enqueue_job('process_upload', filename=upload.filename, post_id=post_id)
+
+@job_handler('process_upload')
+def process_upload_job(filename, post_id=None):
+    width, height = process_upload(filename)
+    Upload.query.filter_by(filename=filename).update(
+        {'width': width, 'height': height,
+         'size': os.path.getsize(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))})
+    db.session.commit()
+    if post_id is not None:
+        Post.query.filter_by(id=post_id, image_file=filename).update(
+            {'image_width': width, 'image_height': height})
+        db.session.commit()
+        invalidate_post_page(post_id)
+
+#___chunked uploads___
+#a client opens a session with the file name and size, then sends the file in pieces
+#with PATCH requests carrying the Upload-Offset they start at. every piece is streamed
+#to the .part file and the offset reached is recorded on the session row; after an
+#interruption the client asks for the current offset and continues from there. the
+#pieces can land on any worker, so the complete file is hashed once, at the end
+
+def upload_session_path(upload_session):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], f'.{upload_session.id}.part')
+
+def upload_session_status(upload_session):
+    return {
+        'id': upload_session.id,
+        'offset': upload_session.offset,
+        'size': upload_session.size,
+        'chunk_size': current_app.config['UPLOAD_SESSION_CHUNK_SIZE'],
+        'url': url_for('gallery.upload_session_status_view', session_id=upload_session.id)
+    }
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def discard_upload_session(upload_session):
+    try:
+        os.remove(upload_session_path(upload_session))
+    except FileNotFoundError:
+        pass
+    db.session.delete(upload_session)
+
+def get_upload_session_or_404(session_id):
+    upload_session = db.session.get(UploadSession, session_id)
+    if upload_session is None or upload_session.user_id != current_user.id:
+        abort(404)
+    return upload_session
+
+@click.command('clean-upload-sessions')
+@with_appcontext
+@click.option('--hours', default=None, type=int, help='Age after which unfinished uploads are dropped.')
+def clean_upload_sessions_command(hours):
+    """Remove chunked uploads that were never completed."""
+    hours = hours if hours is not None else current_app.config['UPLOAD_SESSION_TTL_HOURS']
+    cutoff = datetime.now() - timedelta(hours=hours)
+    stale = UploadSession.query.filter(UploadSession.updated_at < cutoff).all()
+    for upload_session in stale:
+        discard_upload_session(upload_session)
+    db.session.commit()
+    #part files left behind by interrupted form uploads
+    live = {f'.{session_id}.part' for (session_id,) in db.session.query(UploadSession.id)}
+    for path in glob.glob(os.path.join(current_app.config['UPLOAD_FOLDER'], '.*.part')):
+        if os.path.basename(path) not in live and os.path.getmtime(path) < cutoff.timestamp():
+            os.remove(path)
+    click.echo(f'Removed {len(stale)} unfinished uploads.')
+
+#___image derivatives___
+#every upload gets fixed-width copies (only narrower than the original) and a gallery
+#thumbnail, all without metadata. the original is rewritten without EXIF as well
+IMAGE_WIDTHS = (480, 960, 1600)
+THUMBNAIL_SIZE = (320, 320)
+DERIVATIVE_FORMAT = 'WEBP'
+DERIVATIVE_QUALITY = 80
+DERIVATIVE_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+def derived_filename(filename, suffix):
+    stem, _ = os.path.splitext(filename)
+    return f'{stem}-{suffix}.{DERIVATIVE_EXTENSIONS[DERIVATIVE_FORMAT]}'
+
+def save_derivative(image, filename, suffix):
+    if DERIVATIVE_FORMAT == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    path = os.path.join(current_app.config['DERIVED_FOLDER'], derived_filename(filename, suffix))
+    image.save(path, DERIVATIVE_FORMAT, quality=DERIVATIVE_QUALITY)
+
+def strip_metadata(image, path, image_format):
+    tmp_path = path + '.tmp'
+    if image_format == 'JPEG':
+        image.save(tmp_path, image_format, quality=90)
+    else:
+        image.save(tmp_path, image_format)
+    os.replace(tmp_path, path)
+
+#Pillow is imported here rather than at module level: only the job runner and the
+#generate-image-derivatives command decode images
+def process_upload(filename):
+    from PIL import Image, ImageOps
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    os.makedirs(current_app.config['DERIVED_FOLDER'], exist_ok=True)
+    with Image.open(path) as original:
+        image_format = original.format
+        has_exif = bool(original.info.get('exif'))
+        animated = getattr(original, 'is_animated', False)
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image.mode in ('P', 'PA', 'LA') else 'RGB')
+    width, height = image.size
+
+    for target_width in IMAGE_WIDTHS:
+        if target_width >= width:
+            break
+        resized = image.resize((target_width, max(1, round(height * target_width / width))),
+                               Image.Resampling.LANCZOS)
+        save_derivative(resized, filename, f'{target_width}w')
+
+    thumbnail = image.copy()
+    thumbnail.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+    save_derivative(thumbnail, filename, 'thumb')
+
+    if has_exif and not animated and image_format in ('JPEG', 'PNG', 'WEBP'):
+        strip_metadata(image, path, image_format)
+    return width, height
+
+def remove_upload_files(filename):
+    stem, _ = os.path.splitext(filename)
+    paths = [os.path.join(current_app.config['UPLOAD_FOLDER'], filename)]
+    paths += glob.glob(os.path.join(glob.escape(current_app.config['DERIVED_FOLDER']), glob.escape(stem) + '-*'))
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+#(static path, width) of every variant worth sending; the original only when no
+#derivative is at least as wide as it is
+def image_variants(filename, width):
+    variants = [('uploads/derived/' + derived_filename(filename, f'{w}w'), w)
+                for w in IMAGE_WIDTHS if w < width]
+    if width <= IMAGE_WIDTHS[-1]:
+        variants.append(('uploads/' + filename, width))
+    return variants
+
+def image_srcset(filename, width):
+    return ', '.join(f"{url_for('static', filename=path)} {w}w"
+                     for path, w in image_variants(filename, width))
+
+#largest variant, or the original when its width is unknown (not processed yet)
+def image_src(filename, width=None, external=False):
+    path = image_variants(filename, width)[-1][0] if width else 'uploads/' + filename
+    return url_for('static', filename=path, _external=external)
+
+def thumbnail_size(width, height):
+    scale = min(THUMBNAIL_SIZE[0] / width, THUMBNAIL_SIZE[1] / height, 1)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def thumbnail_url(filename):
+    return url_for('static', filename='uploads/derived/' + derived_filename(filename, 'thumb'))
+
+@click.command('generate-image-derivatives')
+@with_appcontext
+def generate_image_derivatives_command():
+    """Create missing resized copies and thumbnails for existing uploads."""
+    processed = 0
+    for filename in sorted(os.listdir(current_app.config['UPLOAD_FOLDER'])):
+        if not allowed_file(filename):
+            continue
+        try:
+            width, height = process_upload(filename)
+        except (OSError, ValueError) as e:
+            click.echo(f'Skipping {filename}: {e}')
+            continue
+        Post.query.filter_by(image_file=filename).update(
+            {'image_width': width, 'image_height': height})
+        Upload.query.filter_by(filename=filename).update({'width': width, 'height': height})
+        processed += 1
+    db.session.commit()
+    click.echo(f'Processed {processed} images.')
+
+def init_app(app):
+    app.add_template_global(image_srcset)
+    app.add_template_global(image_src)
+    app.add_template_global(thumbnail_url)
+    app.cli.add_command(dedupe_uploads_command)
+    app.cli.add_command(clean_upload_sessions_command)
+    app.cli.add_command(generate_image_derivatives_command)
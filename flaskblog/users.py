@@ -0,0 +1,94 @@
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask.cli import with_appcontext
+from flask_login import current_user
+from sqlalchemy import select
+import click
+
+from .caches import invalidate_author_pages
+from .database import db
+from .models import Post, User
+from .pagination import paginate_posts
+from .uploads import allowed_file, process_upload_later, release_upload, save_picture
+
+bp = Blueprint('users', __name__)
+
+#___author statistics___
+#post_count and last_post_at live on the user row so profiles and the about page never
+#count posts; they change in the transaction that creates or deletes the post
+def record_post_created(post):
+    users = User.__table__
+    db.session.execute(users.update().where(users.c.id == post.user_id).values(
+        post_count=users.c.post_count + 1,
+        last_post_at=db.func.max(db.func.coalesce(users.c.last_post_at, post.creation_date), post.creation_date)))
+
+def record_post_deleted(post):
+    users = User.__table__
+    newest = select(db.func.max(Post.creation_date)).where(Post.user_id == post.user_id, Post.id != post.id)
+    db.session.execute(users.update().where(users.c.id == post.user_id).values(
+        post_count=users.c.post_count - 1, last_post_at=newest.scalar_subquery()))
+
+def repair_author_stats():
+    users = User.__table__
+    count = select(db.func.count(Post.id)).where(Post.user_id == users.c.id).scalar_subquery()
+    newest = select(db.func.max(Post.creation_date)).where(Post.user_id == users.c.id).scalar_subquery()
+    fixed = db.session.execute(users.update().where(
+        (users.c.post_count != count) | users.c.last_post_at.is_distinct_from(newest))
+        .values(post_count=count, last_post_at=newest)).rowcount
+    db.session.commit()
+    return fixed
+
+@click.command('repair-author-stats')
+@with_appcontext
+def repair_author_stats_command():
+    """Recompute the per-user post counts from the post table."""
+    click.echo(f'Fixed {repair_author_stats()} author statistics.')
+
+def init_app(app):
+    app.cli.add_command(repair_author_stats_command)
+
+#___user___
+@bp.route("/user/<username>")
+def user_profile(username):
+    user = User.query.filter_by(username=username).first_or_404()
+    posts = paginate_posts(Post.query.filter_by(user_id=user.id), total=user.post_count)
+    return render_template("user_profile.html", user=user, posts=posts)
+
+#___user edit___
+@bp.route("/user/<username>/edit", methods=['GET', 'POST'])
+def edit_profile(username):
+    if request.method == 'POST':
+        #parse the body (spooling the picture) before the lookup takes the write lock
+        request.files
+    user = User.query.filter_by(username=username).first_or_404()
+    if user.id != current_user.id and not current_user.is_admin:
+        flash("Denied! You cannot modify this profile!", "danger")
+        return redirect(url_for('users.user_profile', username=username))
+    if request.method == 'POST':
+        user.bio = request.form['bio']
+        user.link = request.form['link']
+        
+        if current_user.is_admin:
+            user.role = request.form['role']
+            
+        upload = None
+        if 'profile_picture' in request.files:
+            file = request.files['profile_picture']
+            if file and allowed_file(file.filename):
+                try:
+                    upload = save_picture(file, uploader=user)
+                except ValueError as e:
+                    db.session.rollback()
+                    flash(f'Error during uploading image: {e}', 'error')
+                    return render_template('edit_profile.html', user=user)
+                old_picture = user.profile_picture
+                user.profile_picture = f"uploads/{upload.filename}"
+                if old_picture.startswith('uploads/'):
+                    release_upload(old_picture[len('uploads/'):])
+
+        db.session.commit()
+        invalidate_author_pages(user.id)
+        if upload:
+            process_upload_later(upload)
+        flash('Profile updated!', 'success')
+        return redirect(url_for('users.user_profile', username=user.username))
+    return render_template('edit_profile.html', user=user)
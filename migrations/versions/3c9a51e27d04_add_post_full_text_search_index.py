@@ -0,0 +1,37 @@
+"""Add post full-text search index
+
+Revision ID: 3c9a51e27d04
+Revises: 8858366348df
+Create Date: 2026-10-18 09:12:40.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9a51e27d04'
+down_revision = '8858366348df'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from flaskblog.content import html_to_text
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts "
+        "USING fts5(title, content, tokenize='unicode61 remove_diacritics 2')"
+    )
+
+    conn = op.get_bind()
+    posts = conn.execute(sa.text('SELECT id, title, content FROM post')).fetchall()
+    for post_id, title, content in posts:
+        conn.execute(
+            sa.text('INSERT INTO post_fts(rowid, title, content) VALUES (:id, :title, :content)'),
+            {'id': post_id, 'title': title, 'content': html_to_text(content)}
+        )
+
+
+def downgrade():
+    op.execute('DROP TABLE IF EXISTS post_fts')
@@ -0,0 +1,79 @@
+"""Content addressed uploads
+
+Revision ID: 71c0d2e5a8b3
+Revises: e3a7c15b9d40
+Create Date: 2026-10-18 13:05:49.217730
+
+"""
+import hashlib
+import os
+
+from alembic import op
+from flask import current_app
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '71c0d2e5a8b3'
+down_revision = 'e3a7c15b9d40'
+branch_labels = None
+depends_on = None
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def upgrade():
+    with op.batch_alter_table('upload', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('ref_count', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.create_index(batch_op.f('ix_upload_sha256'), ['sha256'], unique=False)
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.alter_column('image_file',
+               existing_type=sa.String(length=28),
+               type_=sa.String(length=100),
+               existing_nullable=True)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('profile_picture',
+               existing_type=sa.String(length=50),
+               type_=sa.String(length=100),
+               existing_nullable=False)
+
+    #hash the files already on disk and count what references them
+    conn = op.get_bind()
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    for upload_id, filename in conn.execute(sa.text('SELECT id, filename FROM upload')).fetchall():
+        path = os.path.join(upload_folder, filename)
+        sha256 = file_sha256(path) if os.path.isfile(path) else None
+        references = conn.execute(sa.text(
+            'SELECT (SELECT count(*) FROM post WHERE image_file = :filename) + '
+            '(SELECT count(*) FROM user WHERE profile_picture = :picture)'),
+            {'filename': filename, 'picture': f'uploads/{filename}'}).scalar()
+        conn.execute(sa.text('UPDATE upload SET sha256 = :sha256, ref_count = :ref_count WHERE id = :id'),
+                     {'id': upload_id, 'sha256': sha256, 'ref_count': max(references, 1)})
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('profile_picture',
+               existing_type=sa.String(length=100),
+               type_=sa.String(length=50),
+               existing_nullable=False)
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.alter_column('image_file',
+               existing_type=sa.String(length=100),
+               type_=sa.String(length=28),
+               existing_nullable=True)
+
+    with op.batch_alter_table('upload', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_upload_sha256'))
+        batch_op.drop_column('ref_count')
+        batch_op.drop_column('sha256')
@@ -0,0 +1,44 @@
+"""Add tag stat table
+
+Revision ID: 8b3e6f1a4c27
+Revises: c4f82a9e1d36
+Create Date: 2026-10-18 15:03:11.406829
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3e6f1a4c27'
+down_revision = 'c4f82a9e1d36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tag_stat',
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.Column('post_count', sa.Integer(), nullable=False),
+    sa.Column('last_used', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('tag_id')
+    )
+    with op.batch_alter_table('tag_stat', schema=None) as batch_op:
+        batch_op.create_index('ix_tag_stat_post_count_last_used', ['post_count', 'last_used'], unique=False)
+
+    #existing tags: count their posts, the newest tagged post stands in for last use
+    op.execute(
+        'INSERT INTO tag_stat (tag_id, post_count, last_used) '
+        'SELECT tag.id, count(post.id), max(post.creation_date) FROM tag '
+        'LEFT JOIN post_tags ON post_tags.tag_id = tag.id '
+        'LEFT JOIN post ON post.id = post_tags.post_id '
+        'GROUP BY tag.id'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('tag_stat', schema=None) as batch_op:
+        batch_op.drop_index('ix_tag_stat_post_count_last_used')
+
+    op.drop_table('tag_stat')
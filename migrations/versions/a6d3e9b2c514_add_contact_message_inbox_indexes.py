@@ -0,0 +1,32 @@
+"""Add contact message inbox indexes
+
+Revision ID: a6d3e9b2c514
+Revises: f29c7d4b8e61
+Create Date: 2026-10-18 16:20:41.508317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d3e9b2c514'
+down_revision = 'f29c7d4b8e61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('UPDATE contact_message SET is_read = 0 WHERE is_read IS NULL')
+
+    with op.batch_alter_table('contact_message', schema=None) as batch_op:
+        batch_op.alter_column('is_read', existing_type=sa.Boolean(), nullable=False)
+        batch_op.create_index('ix_contact_message_is_read_timestamp', ['is_read', 'timestamp'], unique=False)
+        batch_op.create_index('ix_contact_message_timestamp', ['timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('contact_message', schema=None) as batch_op:
+        batch_op.drop_index('ix_contact_message_timestamp')
+        batch_op.drop_index('ix_contact_message_is_read_timestamp')
+        batch_op.alter_column('is_read', existing_type=sa.Boolean(), nullable=True)
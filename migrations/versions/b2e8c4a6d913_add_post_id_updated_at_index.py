@@ -0,0 +1,26 @@
+"""Add post (id, updated_at) index for sitemaps
+
+Revision ID: b2e8c4a6d913
+Revises: f7b3d9e2a4c8
+Create Date: 2026-10-18 18:32:54.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e8c4a6d913'
+down_revision = 'f7b3d9e2a4c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_id_updated_at', ['id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_id_updated_at')
@@ -0,0 +1,38 @@
+"""Add post excerpt and summary
+
+Revision ID: b7e2d4f91a36
+Revises: 3c9a51e27d04
+Create Date: 2026-10-18 10:02:17.554912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d4f91a36'
+down_revision = '3c9a51e27d04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from flaskblog.content import make_excerpt, make_summary
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('excerpt', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('summary', sa.String(length=300), nullable=True))
+
+    conn = op.get_bind()
+    posts = conn.execute(sa.text('SELECT id, content FROM post')).fetchall()
+    for post_id, content in posts:
+        conn.execute(
+            sa.text('UPDATE post SET excerpt = :excerpt, summary = :summary WHERE id = :id'),
+            {'id': post_id, 'excerpt': make_excerpt(content), 'summary': make_summary(content)}
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('summary')
+        batch_op.drop_column('excerpt')
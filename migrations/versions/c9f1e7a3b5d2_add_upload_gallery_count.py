@@ -0,0 +1,31 @@
+"""Add upload gallery_count
+
+Revision ID: c9f1e7a3b5d2
+Revises: b2e8c4a6d913
+Create Date: 2026-10-18 19:14:06.381527
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9f1e7a3b5d2'
+down_revision = 'b2e8c4a6d913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('upload', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('gallery_count', sa.Integer(), nullable=False, server_default='0'))
+
+    #whatever posts and profiles do not account for came from gallery uploads
+    op.execute("UPDATE upload SET gallery_count = max(0, ref_count "
+               "- (SELECT count(*) FROM post WHERE post.image_file = upload.filename) "
+               "- (SELECT count(*) FROM user WHERE user.profile_picture = 'uploads/' || upload.filename))")
+
+
+def downgrade():
+    with op.batch_alter_table('upload', schema=None) as batch_op:
+        batch_op.drop_column('gallery_count')
@@ -0,0 +1,32 @@
+"""Add user post_count and last_post_at
+
+Revision ID: d8a1f4c6e203
+Revises: a6d3e9b2c514
+Create Date: 2026-10-18 16:41:09.672851
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8a1f4c6e203'
+down_revision = 'a6d3e9b2c514'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('post_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_post_at', sa.DateTime(), nullable=True))
+
+    op.execute('UPDATE user SET '
+               'post_count = (SELECT count(*) FROM post WHERE post.user_id = user.id), '
+               'last_post_at = (SELECT max(creation_date) FROM post WHERE post.user_id = user.id)')
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('last_post_at')
+        batch_op.drop_column('post_count')
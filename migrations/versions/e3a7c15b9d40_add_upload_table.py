@@ -0,0 +1,72 @@
+"""Add upload table
+
+Revision ID: e3a7c15b9d40
+Revises: 9d4b6c3e8f12
+Create Date: 2026-10-18 12:20:33.671058
+
+"""
+from datetime import datetime
+import os
+
+from alembic import op
+from flask import current_app
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c15b9d40'
+down_revision = '9d4b6c3e8f12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    upload_table = op.create_table('upload',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=100), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('post_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('filename')
+    )
+    with op.batch_alter_table('upload', schema=None) as batch_op:
+        batch_op.create_index('ix_upload_created_at_id', ['created_at', 'id'], unique=False)
+
+    #import the files already on disk, oldest first, linked to the post or user using them.
+    #no derivatives exist for them, so width/height stay NULL and the gallery shows the original
+    from flaskblog.uploads import allowed_file
+
+    conn = op.get_bind()
+    post_images = {image_file: (post_id, user_id) for post_id, user_id, image_file in conn.execute(
+        sa.text('SELECT id, user_id, image_file FROM post WHERE image_file IS NOT NULL'))}
+    profile_pictures = {picture: user_id for user_id, picture in conn.execute(
+        sa.text('SELECT id, profile_picture FROM user'))}
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if not os.path.isdir(upload_folder):
+        return
+    rows = []
+    for filename in os.listdir(upload_folder):
+        path = os.path.join(upload_folder, filename)
+        if not os.path.isfile(path) or not allowed_file(filename):
+            continue
+        post_id, user_id = post_images.get(filename, (None, profile_pictures.get(f'uploads/{filename}')))
+        stat = os.stat(path)
+        rows.append({'filename': filename, 'size': stat.st_size, 'user_id': user_id, 'post_id': post_id,
+                     'created_at': datetime.fromtimestamp(stat.st_mtime)})
+    rows.sort(key=lambda row: row['created_at'])
+    if rows:
+        op.bulk_insert(upload_table, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('upload', schema=None) as batch_op:
+        batch_op.drop_index('ix_upload_created_at_id')
+
+    op.drop_table('upload')
@@ -0,0 +1,40 @@
+"""Add listing indexes on post, post_tags and user
+
+Revision ID: e5c2a8f07b19
+Revises: d8a1f4c6e203
+Create Date: 2026-10-18 17:05:37.214960
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c2a8f07b19'
+down_revision = 'd8a1f4c6e203'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_creation_date_id', ['creation_date', 'id'], unique=False)
+        batch_op.create_index('ix_post_user_id_creation_date', ['user_id', 'creation_date'], unique=False)
+
+    with op.batch_alter_table('post_tags', schema=None) as batch_op:
+        batch_op.create_index('ix_post_tags_tag_id_post_id', ['tag_id', 'post_id'], unique=False)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_post_count', ['post_count'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_post_count')
+
+    with op.batch_alter_table('post_tags', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_tags_tag_id_post_id')
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_user_id_creation_date')
+        batch_op.drop_index('ix_post_creation_date_id')
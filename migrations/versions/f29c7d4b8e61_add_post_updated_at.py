@@ -0,0 +1,31 @@
+"""Add post updated_at
+
+Revision ID: f29c7d4b8e61
+Revises: 8b3e6f1a4c27
+Create Date: 2026-10-18 15:48:20.113657
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f29c7d4b8e61'
+down_revision = '8b3e6f1a4c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    op.execute('UPDATE post SET updated_at = coalesce(creation_date, CURRENT_TIMESTAMP)')
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,32 @@
+"""Add feed_entry table
+
+Revision ID: f7b3d9e2a4c8
+Revises: e5c2a8f07b19
+Create Date: 2026-10-18 17:48:22.905113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7b3d9e2a4c8'
+down_revision = 'e5c2a8f07b19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    #entries are filled by `flask rebuild-feeds`; until then feeds render missing ones on the fly
+    op.create_table('feed_entry',
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('atom', sa.Text(), nullable=False),
+    sa.Column('rss', sa.Text(), nullable=False),
+    sa.Column('built_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('post_id')
+    )
+
+
+def downgrade():
+    op.drop_table('feed_entry')
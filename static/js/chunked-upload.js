@@ -0,0 +1,103 @@
+// sends the selected file to the chunked upload endpoint one piece at a time.
+// the session id is kept in localStorage so a page reload can resume the upload
+document.addEventListener('DOMContentLoaded', () => {
+    const form = document.querySelector('form[data-chunked-upload]');
+    if (!form || !window.fetch || !window.Blob || !Blob.prototype.slice) {
+        return;
+    }
+    const input = form.querySelector('input[type="file"]');
+    const progress = form.querySelector('progress');
+    const status = form.querySelector('.upload-status');
+    const maxRetries = 5;
+
+    const storageKey = (file) => `upload:${file.name}:${file.size}:${file.lastModified}`;
+    const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+    const showProgress = (offset, size) => {
+        progress.hidden = false;
+        progress.max = size;
+        progress.value = offset;
+        status.textContent = `${Math.floor(offset * 100 / size)}%`;
+    };
+
+    const openSession = async (file) => {
+        const savedUrl = localStorage.getItem(storageKey(file));
+        if (savedUrl) {
+            const response = await fetch(savedUrl);
+            if (response.ok) {
+                return response.json();
+            }
+            localStorage.removeItem(storageKey(file));
+        }
+        const response = await fetch(form.dataset.chunkedUpload, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({filename: file.name, size: file.size})
+        });
+        const session = await response.json();
+        if (!response.ok) {
+            throw new Error(session.error || 'Upload failed.');
+        }
+        localStorage.setItem(storageKey(file), session.url);
+        return session;
+    };
+
+    const upload = async (file) => {
+        const session = await openSession(file);
+        let offset = session.offset;
+        let retries = 0;
+        showProgress(offset, file.size);
+        while (true) {
+            let response;
+            try {
+                response = await fetch(session.url, {
+                    method: 'PATCH',
+                    headers: {'Upload-Offset': String(offset)},
+                    body: file.slice(offset, offset + session.chunk_size)
+                });
+            } catch (err) {
+                if (++retries > maxRetries) {
+                    throw new Error('Connection lost, select the same file again to resume.');
+                }
+                await sleep(1000 * 2 ** retries);
+                response = await fetch(session.url);
+                if (!response.ok) {
+                    throw new Error('Upload expired, please start again.');
+                }
+                offset = (await response.json()).offset;
+                continue;
+            }
+            const data = await response.json();
+            if (response.status === 201) {
+                localStorage.removeItem(storageKey(file));
+                return data;
+            }
+            if (response.status === 409 || (response.ok && 'offset' in data)) {
+                offset = data.offset;
+                retries = 0;
+                showProgress(offset, file.size);
+                continue;
+            }
+            localStorage.removeItem(storageKey(file));
+            throw new Error(data.error || 'Upload failed.');
+        }
+    };
+
+    form.addEventListener('submit', async (event) => {
+        event.preventDefault();
+        const file = input.files[0];
+        if (!file) {
+            return;
+        }
+        const button = form.querySelector('button[type="submit"]');
+        button.disabled = true;
+        try {
+            const data = await upload(file);
+            status.textContent = `Image ${data.filename} successfully uploaded!`;
+            window.location.reload();
+        } catch (err) {
+            status.textContent = err.message;
+            button.disabled = false;
+        }
+    });
+});